@@ -6,12 +6,13 @@ from datetime import datetime, timedelta, date
 from collections import defaultdict
 from openai import OpenAI
 
-from storage import load
-from rank_storage import load as load_group_rank
+from repository import repo
+from names import names
+from storage_io import load_rank
 from habits import HABITS
-from ranks import RANKS
+from rank_plan import plan_for
 from helpers import (
-    current_week_id, get_summary_for, get_all_streaks, 
+    current_week_id, get_all_streaks, 
     format_streak_display, LOCAL_TZ
 )
 
@@ -44,13 +45,11 @@ def ask_gpt(system_content, user_content, max_tokens=1000, temperature=0):
 
 async def gather_team_context(bot=None):
     """Gather comprehensive team data for AI analysis"""
-    data = load()
     current_week = current_week_id()
-    current_rank = load_group_rank()
+    current_rank = await load_rank()
     
-    # Get current week summary and raw data
-    week_summary = get_summary_for(current_week)
-    week_data = data.get(current_week, {})
+    # Get current week raw data
+    week_data = repo.week(current_week)
     
     # Calculate days into week
     today = datetime.now(LOCAL_TZ).date()
@@ -58,102 +57,34 @@ async def gather_team_context(bot=None):
     days_elapsed = (today - week_start).days + 1  # +1 because we count today
     days_remaining = 7 - days_elapsed
     
-    # Get current rank challenges
-    rank_info = next(r for r in RANKS if r["level"] == current_rank)
+    # Current rank and weekly targets (same plan the progress command uses)
+    plan = plan_for(current_rank)
+    rank_info = plan.rank
+    habit_targets = plan.weekly_targets
     
-    # Build habit targets map using same logic as progress command
-    unlocked = []
-    for r in RANKS[:current_rank]:
-        for t in r["tasks"]:
-            if t["habit"] not in unlocked:
-                unlocked.append(t["habit"])
-
-    # Compute weekly targets per habit from RANKS (same as progress command)
-    habit_targets = {}
-    for h in unlocked:
-        day_targets = []
-        for r in RANKS[:current_rank]:
-            for t in r["tasks"]:
-                if t["habit"] == h and t["target"].endswith("days"):
-                    try:
-                        val = int(t["target"].rstrip("days"))
-                        day_targets.append(val)
-                    except ValueError:
-                        pass
-        if day_targets:
-            habit_targets[h] = max(day_targets)
-        else:
-            habit_targets[h] = HABITS[h].get("weekly_target", 7)
-    
-    # Helper function to get username
-    async def get_username(user_id):
-        if not bot:
-            return f"User_{user_id[:6]}"
-        try:
-            # Try to get from guild members first
-            for guild in bot.guilds:
-                member = guild.get_member(int(user_id))
-                if member:
-                    return member.display_name
-            # Fallback to fetching user
-            user = await bot.fetch_user(int(user_id))
-            return user.display_name if user else f"User_{user_id[:6]}"
-        except:
-            return f"User_{user_id[:6]}"
+    # Progress and risk level for every user and target habit in one reduction
+    week_risk = repo.engine().risk(week_start, today, habit_targets)
     
     # Analyze each user's progress
     users_analysis = {}
     username_map = {}
     all_users = set(week_data.keys()) if week_data else set()
     
+    # Resolve every name up front, concurrently
+    resolved = await names.prefetch(all_users) if bot else {}
+    
     for user_id in all_users:
         # Get username
-        username = await get_username(user_id)
+        username = resolved.get(user_id) or f"User_{user_id[:6]}"
         username_map[user_id] = username
         
         user_days = week_data[user_id]
-        user_summary = week_summary.get(user_id, {})
         
         # Get streak data
         streaks = get_all_streaks(user_id)
         
-        # Analyze habit progress
-        habit_analysis = {}
-        for habit, target_num in habit_targets.items():
-            completed = user_summary.get(habit, 0)
-            
-            # Determine if daily habit (target_num is now available)
-            is_daily = (target_num == 7)  # Simple: if target is 7 times per week, it's daily
-            
-            # Risk assessment
-            if is_daily:
-                # For daily habits (must be done every day)
-                if completed >= target_num:
-                    risk = "NONE"  # Already completed all required days
-                elif completed < (days_elapsed - 1):
-                    risk = "HIGH"  # Missed previous days - truly behind
-                elif completed < days_elapsed:
-                    risk = "MEDIUM"  # Haven't done today yet - at risk
-                else:
-                    risk = "NONE"  # Up to date including today
-            else:
-                # For weekly habits (need X times per week)
-                tasks_remaining = target_num - completed
-                if completed >= target_num:
-                    risk = "NONE"  # Already completed target
-                elif tasks_remaining > days_remaining:
-                    risk = "HIGH"  # Impossible to complete - behind
-                elif tasks_remaining == days_remaining:
-                    risk = "MEDIUM"  # Must do today or will fail - at risk
-                else:
-                    risk = "LOW"  # Have buffer days - tracking
-            
-            habit_analysis[habit] = {
-                "completed": completed,
-                "target": target_num,
-                "is_daily": is_daily,
-                "risk": risk
-            }
+        # Habit progress and risk, from the vectorized pass above
+        habit_analysis = week_risk[user_id]
         
         # Check for recent activity
         recent_checkins = sum(1 for day_data in user_days.values() if day_data)
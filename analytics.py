@@ -0,0 +1,183 @@
+# analytics.py
+# Dense NumPy copy of the whole check-in history for analytics:
+#   done[u, h, d]  - habit h logged by user u on day d
+#   value[u, h, d] - minutes/pages it contributed (0 for bool habits)
+# Users and habits are interned to row/column indices, and days are offsets
+# from day0. The repository keeps it current one (user, day) cell column at
+# a time. It backs exactly three readers: the leaderboard totals rebuilt at
+# startup and the AI update's risk levels are reductions over the arrays,
+# and /trends reads cumulative sums per (user, habit), two lookups per
+# range. Week counts and streaks come from the repository's own indexes.
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+import archive
+
+
+class Engine:
+    def __init__(self):
+        self.users: List[str] = []
+        self.habits: List[str] = []
+        self._user_ix: Dict[str, int] = {}
+        self._habit_ix: Dict[str, int] = {}
+        self.day0 = None            # ordinal of day index 0
+        self.n_days = 0             # day indices in use
+        self.done = np.zeros((0, 0, 0), dtype=bool)
+        self.value = np.zeros((0, 0, 0), dtype=np.int64)
+        # u -> h -> (days logged, value) summed over day indices < i, built on
+        # first range query and dropped when that user writes
+        self._prefix: Dict[int, Dict[int, Tuple[np.ndarray, np.ndarray]]] = {}
+
+    # ---------- building ----------
+    def build(self, weeks: Iterable[dict]):
+        """Load every {user_id: {day_iso: [tokens]}} week from scratch."""
+        self.__init__()
+        us, hs, ds, amounts = [], [], [], []
+        for week in weeks:
+            for uid, days in week.items():
+                u = self._intern(self._user_ix, self.users, uid)
+                for day_iso, tokens in days.items():
+                    ordinal = date.fromisoformat(day_iso).toordinal()
+                    for tok in tokens:
+                        us.append(u)
+                        hs.append(self._intern(self._habit_ix, self.habits, archive.token_habit(tok)))
+                        ds.append(ordinal)
+                        amounts.append(archive.token_amount(tok))
+        if not ds:
+            return
+        ds = np.asarray(ds)
+        self.day0 = int(ds.min())
+        self.n_days = int(ds.max()) - self.day0 + 1
+        shape = (len(self.users), len(self.habits), self.n_days)
+        self.done = np.zeros(shape, dtype=bool)
+        self.value = np.zeros(shape, dtype=np.int64)
+        index = (np.asarray(us), np.asarray(hs), ds - self.day0)
+        self.done[index] = True
+        np.add.at(self.value, index, np.asarray(amounts, dtype=np.int64))
+
+    @staticmethod
+    def _intern(ix: Dict[str, int], names: List[str], name: str) -> int:
+        i = ix.get(name)
+        if i is None:
+            i = ix[name] = len(names)
+            names.append(name)
+        return i
+
+    def _grow(self, users: int, habits: int, days: int, front: int = 0):
+        """Make room for the given counts (days includes `front` new leading days)."""
+        cap_u, cap_h, cap_d = self.done.shape
+        if users <= cap_u and habits <= cap_h and days <= cap_d and not front:
+            return
+        def size(need, cap, extra=0):
+            return max(need, cap + extra, 2 * cap if need > cap else 0)
+        shape = (size(users, cap_u), size(habits, cap_h), size(days, cap_d, front))
+        done = np.zeros(shape, dtype=bool)
+        value = np.zeros(shape, dtype=np.int64)
+        done[:cap_u, :cap_h, front:front + cap_d] = self.done
+        value[:cap_u, :cap_h, front:front + cap_d] = self.value
+        self.done, self.value = done, value
+
+    def update(self, user_id: str, day_iso: str, tokens):
+        """Replace one user's day with `tokens` (None or [] clears it).
+
+        Parsing and any reallocation happen before a cell changes, so a
+        failed update leaves the arrays as they were.
+        """
+        ordinal = date.fromisoformat(day_iso).toordinal()
+        amounts = [archive.token_amount(tok) for tok in tokens or ()]
+        day0 = ordinal if self.day0 is None else min(self.day0, ordinal)
+        front = 0 if self.day0 is None else self.day0 - day0
+        d = ordinal - day0
+        u = self._intern(self._user_ix, self.users, user_id)
+        hs = [self._intern(self._habit_ix, self.habits, archive.token_habit(tok)) for tok in tokens or ()]
+        self._grow(len(self.users), len(self.habits), max(self.n_days + front, d + 1), front)
+        if front:
+            self._prefix.clear()
+        self.day0 = day0
+        self.n_days = max(self.n_days + front, d + 1)
+        self._prefix.pop(u, None)
+        self.done[u, :, d] = False
+        self.value[u, :, d] = 0
+        for h, amount in zip(hs, amounts):
+            self.done[u, h, d] = True
+            self.value[u, h, d] += amount
+
+    # ---------- reductions ----------
+    def _slice(self, start: int = None, end: int = None) -> Tuple[slice, slice, slice]:
+        lo = 0 if start is None else max(0, start - self.day0)
+        hi = self.n_days if end is None else min(self.n_days, end - self.day0 + 1)
+        return slice(0, len(self.users)), slice(0, len(self.habits)), slice(lo, max(lo, hi))
+
+    def _table(self, matrix: np.ndarray) -> Dict[str, Dict[str, int]]:
+        out = {}
+        for u, h in zip(*np.nonzero(matrix)):
+            out.setdefault(self.users[u], {})[self.habits[h]] = int(matrix[u, h])
+        return out
+
+    def totals(self) -> Dict[str, Dict[str, int]]:
+        """{user_id: {habit: all-time minutes/pages}}"""
+        if self.day0 is None:
+            return {}
+        return self._table(self.value[self._slice()].sum(axis=2))
+
+    def _prefix_for(self, u: int, h: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows = self._prefix.setdefault(u, {})
+        pair = rows.get(h)
+        if pair is None or len(pair[0]) != self.n_days + 1:
+            done = np.zeros(self.n_days + 1, dtype=np.int64)
+            value = np.zeros(self.n_days + 1, dtype=np.int64)
+            np.cumsum(self.done[u, h, :self.n_days], out=done[1:])
+            np.cumsum(self.value[u, h, :self.n_days], out=value[1:])
+            pair = rows[h] = (done, value)
+        return pair
+
+    def range(self, user_id: str, habit: str, start: date, end: date) -> Tuple[int, int]:
+        """(days logged, minutes/pages) for one user and habit, start..end inclusive."""
+        u, h = self._user_ix.get(user_id), self._habit_ix.get(habit)
+        if u is None or h is None or self.day0 is None:
+            return 0, 0
+        lo = min(max(0, start.toordinal() - self.day0), self.n_days)
+        hi = min(max(0, end.toordinal() - self.day0 + 1), self.n_days)
+        if hi <= lo:
+            return 0, 0
+        done, value = self._prefix_for(u, h)
+        return int(done[hi] - done[lo]), int(value[hi] - value[lo])
+
+    def risk(self, week_start: date, today: date, targets: Dict[str, int]) -> Dict[str, Dict[str, dict]]:
+        """Per-user, per-target-habit progress and risk level for the week so far.
+
+        Daily habits (target 7): HIGH once a previous day was missed, MEDIUM
+        while today is still open. Weekly habits: HIGH when the remaining
+        days can't cover the gap, MEDIUM when every remaining day is needed,
+        LOW otherwise. Met targets are NONE.
+        """
+        days_elapsed = (today - week_start).days + 1
+        days_remaining = 7 - days_elapsed
+        names = list(targets)
+        target = np.array([targets[h] for h in names], dtype=np.int64)
+        cols = [self._habit_ix.get(h, -1) for h in names]
+        if self.day0 is None:
+            completed = np.zeros((0, len(names)), dtype=np.int64)
+        else:
+            week = self.done[self._slice(week_start.toordinal(), week_start.toordinal() + 6)].sum(axis=2)
+            completed = np.stack([week[:, c] if c >= 0 else np.zeros(len(self.users), dtype=week.dtype)
+                                  for c in cols], axis=1) if names else np.zeros((len(self.users), 0))
+        daily = target == 7
+        remaining = target - completed
+        level = np.select(
+            [completed >= target,
+             daily & (completed < days_elapsed - 1),
+             daily & (completed < days_elapsed),
+             daily,
+             remaining > days_remaining,
+             remaining == days_remaining],
+            ["NONE", "HIGH", "MEDIUM", "NONE", "HIGH", "MEDIUM"],
+            "LOW")
+        return {
+            uid: {h: {"completed": int(completed[u, j]), "target": int(target[j]),
+                      "is_daily": bool(daily[j]), "risk": str(level[u, j])}
+                  for j, h in enumerate(names)}
+            for u, uid in enumerate(self.users)
+        }
@@ -0,0 +1,107 @@
+# archive.py
+# Cold tier for closed weeks: each week is stored zlib-compressed in the
+# packed encoding, with a per-user/per-habit summary kept alongside so
+# aggregate readers never have to decompress raw days.
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, List, Set
+
+import packed
+from habits import HABITS
+
+ARCHIVE_DIR = Path("data/archive")
+SUMMARY_FILE = ARCHIVE_DIR / "summaries.json"
+
+_summary_cache = None   # ((mtime_ns, size), summaries)
+
+
+def _week_file(week_id: str) -> Path:
+    return ARCHIVE_DIR / f"{week_id}.hbp.z"
+
+
+def token_habit(token: str) -> str:
+    """Habit a token is for: "reading:30" -> "reading"."""
+    return token.split(":", 1)[0]
+
+
+def habits_of(tokens) -> Set[str]:
+    """Distinct habits logged in one day's tokens (None for an empty day)."""
+    return {token_habit(tok) for tok in tokens or ()}
+
+
+def token_amount(token: str) -> int:
+    """Amount a token contributes to totals (minutes/pages; 0 for bool habits)."""
+    name, _, val = token.partition(":")
+    cfg = HABITS.get(name)
+    if not cfg or cfg["unit"] != "minutes":
+        return 0
+    return int(val) if val else cfg.get("min", 0)
+
+
+def summarize(week: dict) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """{user_id: {habit: {"count": days logged, "total": minutes/pages}}}"""
+    out = {}
+    for uid, days in week.items():
+        per_habit = out.setdefault(uid, {})
+        for tokens in days.values():
+            for tok in tokens:
+                s = per_habit.setdefault(token_habit(tok), {"count": 0, "total": 0})
+                s["count"] += 1
+                s["total"] += token_amount(tok)
+    return out
+
+
+def summaries() -> Dict[str, dict]:
+    """{week_id: summarize(week)} for every archived week."""
+    global _summary_cache
+    try:
+        st = SUMMARY_FILE.stat()
+    except FileNotFoundError:
+        return {}
+    sig = (st.st_mtime_ns, st.st_size)
+    if _summary_cache is None or _summary_cache[0] != sig:
+        _summary_cache = (sig, json.loads(SUMMARY_FILE.read_text()))
+    return _summary_cache[1]
+
+
+def _save_summaries(sums: dict):
+    global _summary_cache
+    tmp = SUMMARY_FILE.with_name(SUMMARY_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(sums, separators=(",", ":")))
+    os.replace(tmp, SUMMARY_FILE)
+    _summary_cache = None
+
+
+def week_ids() -> List[str]:
+    return sorted(summaries())
+
+
+def has(week_id: str) -> bool:
+    return week_id in summaries()
+
+
+def store_week(week_id: str, week: dict):
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _week_file(week_id)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(zlib.compress(packed.encode({week_id: week}), 9))
+    os.replace(tmp, path)
+    sums = dict(summaries())
+    sums[week_id] = summarize(week)
+    _save_summaries(sums)
+
+
+def load_week(week_id: str) -> dict:
+    path = _week_file(week_id)
+    if not path.exists():
+        return {}
+    return packed.decode_week(zlib.decompress(path.read_bytes()), week_id)
+
+
+def remove(week_id: str):
+    sums = dict(summaries())
+    if sums.pop(week_id, None) is not None:
+        _save_summaries(sums)
+    _week_file(week_id).unlink(missing_ok=True)
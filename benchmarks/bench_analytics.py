@@ -0,0 +1,150 @@
+# benchmarks/bench_analytics.py
+# The dict-walking analytics (as they were before analytics.py) against the
+# NumPy engine, on 50 users x 5 years of synthetic history. Results are
+# checked against each other before timing.
+#
+#   python benchmarks/bench_analytics.py
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import analytics  # noqa: E402
+from habits import HABITS  # noqa: E402
+
+USERS = 50
+YEARS = 5
+TOKENS = ["meditation:30", "exercise", "reading:{}", "walking",
+          "porn", "journaling", "diet", "bedtime", "digitaldetox:15", "streaming"]
+START = date(2021, 1, 4)
+TODAY = START + timedelta(weeks=52 * YEARS - 1, days=3)   # a Thursday in the last week
+TARGETS = {"meditation": 7, "exercise": 4, "reading": 7, "walking": 4, "diet": 7}
+
+
+def synthetic_history() -> dict:
+    rnd = random.Random(13)
+    data = {}
+    for w in range(52 * YEARS):
+        monday = START + timedelta(weeks=w)
+        week = data.setdefault(monday.isoformat(), {})
+        for u in range(USERS):
+            days = week.setdefault(str(109596804374360064 + u * 7919), {})
+            for d in range(7):
+                day = monday + timedelta(days=d)
+                if day <= TODAY and rnd.random() < 0.85:
+                    tokens = rnd.sample(TOKENS, rnd.randint(3, 8))
+                    days[day.isoformat()] = [t.format(rnd.randint(10, 40)) for t in tokens]
+    return data
+
+
+# ---------- the pre-engine implementations ----------
+def old_leaderboard(data):
+    totals = defaultdict(lambda: defaultdict(int))
+    for week_data in data.values():
+        for uid, days in week_data.items():
+            for tokens in days.values():
+                for tok in tokens:
+                    name, *val = tok.split(":", 1)
+                    cfg = HABITS.get(name)
+                    if cfg and cfg["unit"] == "minutes":
+                        amt = int(val[0]) if val else cfg.get("min", 0)
+                        totals[uid][name] += amt
+    return totals
+
+
+def old_summary(data, week_id):
+    summary = defaultdict(lambda: defaultdict(int))
+    for uid, days in data.get(week_id, {}).items():
+        for tokens in days.values():
+            for tok in tokens:
+                summary[uid][tok.split(":", 1)[0]] += 1
+    return summary
+
+
+def old_risk(data):
+    week_start = TODAY - timedelta(days=TODAY.weekday())
+    summary = old_summary(data, week_start.isoformat())
+    days_elapsed = (TODAY - week_start).days + 1
+    days_remaining = 7 - days_elapsed
+    out = {}
+    for uid in data[week_start.isoformat()]:
+        per = out[uid] = {}
+        for habit, target in TARGETS.items():
+            completed = summary.get(uid, {}).get(habit, 0)
+            if completed >= target:
+                risk = "NONE"
+            elif target == 7:
+                risk = "HIGH" if completed < days_elapsed - 1 else "MEDIUM" if completed < days_elapsed else "NONE"
+            else:
+                left = target - completed
+                risk = "HIGH" if left > days_remaining else "MEDIUM" if left == days_remaining else "LOW"
+            per[habit] = risk
+    return out
+
+
+def old_range(data, user_id, habit, start, end):
+    days = total = 0
+    for week_data in data.values():
+        for day_iso, tokens in week_data.get(user_id, {}).items():
+            if start.isoformat() <= day_iso <= end.isoformat():
+                for tok in tokens:
+                    name, *val = tok.split(":", 1)
+                    if name == habit:
+                        days += 1
+                        total += int(val[0]) if val else HABITS.get(name, {}).get("min", 0)
+    return days, total
+
+
+def best_of(fn, runs=5) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000
+
+
+def main():
+    data = synthetic_history()
+    t0 = time.perf_counter()
+    engine = analytics.Engine()
+    engine.build(data.values())
+    build_ms = (time.perf_counter() - t0) * 1000
+    week_start = TODAY - timedelta(days=TODAY.weekday())
+
+    # same answers first
+    old_totals = {u: {h: v for h, v in hs.items() if v} for u, hs in old_leaderboard(data).items()}
+    assert engine.totals() == old_totals
+    risk = engine.risk(week_start, TODAY, TARGETS)
+    assert {u: {h: r["risk"] for h, r in per.items()} for u, per in risk.items()} == old_risk(data)
+
+    uid = str(109596804374360064)
+    half_year = (TODAY - timedelta(days=181), TODAY)
+    assert engine.range(uid, "reading", *half_year) == old_range(data, uid, "reading", *half_year)
+
+    cells = engine.done.size
+    print(f"{USERS} users x {YEARS} years: {cells:,} cells, "
+          f"{(engine.done.nbytes + engine.value.nbytes) / 1e6:.1f} MB, built in {build_ms:.0f} ms")
+    rows = [
+        ("leaderboard totals", lambda: old_leaderboard(data), engine.totals),
+        ("risk levels", lambda: old_risk(data), lambda: engine.risk(week_start, TODAY, TARGETS)),
+        ("6-month range", lambda: old_range(data, uid, "reading", *half_year),
+         lambda: engine.range(uid, "reading", *half_year)),
+        ("one-day update", None, lambda: engine.update(str(109596804374360064), TODAY.isoformat(),
+                                                       ["meditation:30", "exercise"])),
+    ]
+    print(f"{'':>20} {'dicts ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for name, old, new in rows:
+        new_ms = best_of(new)
+        if old is None:
+            print(f"{name:>20} {'-':>10} {new_ms:>10.3f} {'-':>8}")
+            continue
+        old_ms = best_of(old)
+        print(f"{name:>20} {old_ms:>10.2f} {new_ms:>10.3f} {old_ms / new_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_journal.py
+# Per-write cost of a single check-in as history grows: full JSON rewrite vs journal append.
+#
+#   python benchmarks/bench_journal.py
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import storage  # noqa: E402
+
+USERS = 10
+HABIT_TOKENS = ["meditation:30", "exercise", "reading:12", "walking", "journaling", "diet", "bedtime"]
+WRITES = 200
+
+
+def synthetic_history(weeks: int) -> dict:
+    rnd = random.Random(weeks)
+    start = date(2020, 1, 6)
+    data = {}
+    for w in range(weeks):
+        monday = start + timedelta(weeks=w)
+        week = data.setdefault(monday.isoformat(), {})
+        for u in range(USERS):
+            days = week.setdefault(str(100000 + u), {})
+            for d in range(7):
+                days[(monday + timedelta(days=d)).isoformat()] = rnd.sample(HABIT_TOKENS, 4)
+    return data
+
+
+def time_writes(backend: str, data: dict, tmp: Path) -> float:
+    storage.BACKEND = backend
+    storage.DATA_FILE = tmp / f"{backend}.json"
+    storage.JOURNAL_FILE = tmp / f"{backend}.log"
+    storage.save(data)
+    last_week = max(data)
+    day = last_week
+    t0 = time.perf_counter()
+    for i in range(WRITES):
+        key = (last_week, str(100000 + i % USERS), day)
+        storage.set_day(data, *key, ["meditation:%d" % (30 + i)])
+        storage.save_days(data, [key])
+    elapsed = time.perf_counter() - t0
+    if storage._compactor is not None:
+        storage._compactor.join()
+    return elapsed / WRITES * 1e6
+
+
+def main():
+    storage.JOURNAL_COMPACT_BYTES = 256 * 1024
+    print(f"{'weeks':>6} {'file KB':>9} {'json us/write':>14} {'journal us/write':>17}")
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        for weeks in (4, 52, 156, 260, 520):
+            data = synthetic_history(weeks)
+            json_us = time_writes("json", data, tmp)
+            size_kb = storage.DATA_FILE.stat().st_size / 1024
+            journal_us = time_writes("journal", data, tmp)
+            # journal must round-trip to the same state
+            assert storage.load() == data
+            print(f"{weeks:>6} {size_kb:>9.0f} {json_us:>14.0f} {journal_us:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
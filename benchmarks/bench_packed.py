@@ -0,0 +1,88 @@
+# benchmarks/bench_packed.py
+# Size and load time of the packed binary format vs progress.json on a
+# synthetic multi-year dataset, after checking that odd token values
+# round-trip unchanged.
+#
+#   python benchmarks/bench_packed.py
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import packed  # noqa: E402
+
+USERS = 20
+YEARS = 5
+TOKENS = ["meditation:30", "meditation:45", "exercise", "reading:12", "reading:25", "walking",
+          "porn", "journaling", "diet", "bedtime", "digitaldetox:15", "streaming"]
+
+
+def synthetic_history() -> dict:
+    rnd = random.Random(42)
+    start = date(2021, 1, 4)
+    data = {}
+    for w in range(52 * YEARS):
+        monday = start + timedelta(weeks=w)
+        week = data.setdefault(monday.isoformat(), {})
+        for u in range(USERS):
+            days = week.setdefault(str(109596804374360064 + u * 7919), {})
+            for d in range(7):
+                if rnd.random() < 0.85:
+                    days[(monday + timedelta(days=d)).isoformat()] = rnd.sample(TOKENS, rnd.randint(3, 8))
+    return data
+
+
+# values that must be kept as whole tokens, not split into habit + i32
+ODD_TOKENS = ["reading:007", "reading:0", "meditation:²", "meditation:٣", "reading:2147483647",
+              "reading:2147483648", "reading:99999999999", "reading:", "reading:abc", "reading:-5"]
+
+
+def check_odd_values():
+    data = {"2026-10-12": {"1": {"2026-10-12": ODD_TOKENS, "2026-10-13": []}}}
+    assert packed.decode(packed.encode(data)) == data
+
+
+def best_of(fn, runs=5) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000
+
+
+def main():
+    check_odd_values()
+    data = synthetic_history()
+    week_id = sorted(data)[len(data) // 2]
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        pretty = tmp / "progress.json"
+        compact = tmp / "progress.min.json"
+        binary = tmp / "progress.bin"
+        pretty.write_text(json.dumps(data, indent=2))
+        compact.write_text(json.dumps(data, separators=(",", ":")))
+        packed.dump(data, binary)
+
+        assert packed.load(binary) == data
+        assert packed.load_week(binary, week_id) == data[week_id]
+
+        print(f"{USERS} users x {YEARS} years, {len(data)} weeks\n")
+        print(f"{'format':<22} {'size KB':>9} {'full load ms':>13} {'one week ms':>12}")
+        for name, path, full, week in [
+            ("json (indent=2)", pretty, lambda: json.loads(pretty.read_text()),
+             lambda: json.loads(pretty.read_text())[week_id]),
+            ("json (compact)", compact, lambda: json.loads(compact.read_text()),
+             lambda: json.loads(compact.read_text())[week_id]),
+            ("packed", binary, lambda: packed.load(binary),
+             lambda: packed.load_week(binary, week_id)),
+        ]:
+            print(f"{name:<22} {path.stat().st_size / 1024:>9.0f} {best_of(full):>13.1f} {best_of(week):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/stress_transactions.py
+# Interleaved reaction-style and /checkin-style writers hammering a few
+# (week, user) keys from threads and the event loop at once. Every write
+# appends a unique token, so a lost update shows up as a missing token.
+# The same workload without version checks is run first for comparison.
+#
+#   python benchmarks/stress_transactions.py
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import archive  # noqa: E402
+import reports  # noqa: E402
+import storage  # noqa: E402
+from repository import Repository  # noqa: E402
+
+WEEK = "2026-10-12"
+USERS = ["100", "200", "300"]
+DAYS = ["2026-10-12", "2026-10-13"]
+THREADS = 8
+OPS = 400           # per thread
+ASYNC_OPS = 400
+
+
+def keys_for(i: int):
+    return WEEK, USERS[i % len(USERS)], DAYS[(i // len(USERS)) % len(DAYS)]
+
+
+def reaction(key, token):
+    """handle_reaction shape: read the day, append the habit if absent."""
+    def mutate(txn):
+        tasks = txn.get_day(*key)
+        time.sleep(0)   # let other writers in between read and write
+        if token not in tasks:
+            txn.set_day(*key, tasks + [token])
+        return True
+    return mutate
+
+
+def slash(key, token):
+    """/checkin shape: read, drop entries for the same habit, append."""
+    def mutate(txn):
+        tasks = txn.get_day(*key)
+        time.sleep(0)
+        txn.set_day(*key, [t for t in tasks if t.split(":", 1)[0] != token] + [token + ":30"])
+        return True
+    return mutate
+
+
+def unchecked(repo):
+    """Same API, but writes whatever it computed without validating versions."""
+    def run(mutate):
+        writes = {}
+
+        class Blind:
+            def get_day(self, *key):
+                with repo._lock:
+                    return list(storage.get_day(repo._hot(), *key) or [])
+
+            def set_day(self, *args):
+                writes[args[:3]] = args[3]
+
+        mutate(Blind())
+        with repo._lock:
+            for key, tokens in writes.items():
+                repo._set_day(*key, tokens)
+    return run
+
+
+def workload(run, tag: str):
+    def worker(t):
+        for i in range(OPS):
+            key = keys_for(i + t)
+            make = reaction if i % 2 else slash
+            run(make(key, f"{tag}t{t}n{i}"))
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    for th in threads:
+        th.start()
+    return threads
+
+
+def count_missing(data, tag: str) -> int:
+    present = set()
+    for days in data.get(WEEK, {}).values():
+        for tokens in days.values():
+            present.update(tok.split(":", 1)[0] for tok in tokens)
+    expected = {f"{tag}t{t}n{i}" for t in range(THREADS) for i in range(OPS)}
+    expected |= {f"{tag}a{i}" for i in range(ASYNC_OPS)}
+    return len(expected - present)
+
+
+async def run_mode(repo, run, tag: str):
+    await repo.start()
+    threads = workload(run, tag)
+    if run == repo.transact:
+        # reactions arrive together and share group commits
+        await asyncio.gather(*(repo.commit(reaction(keys_for(i), f"{tag}a{i}"))
+                               for i in range(ASYNC_OPS)))
+    else:
+        for i in range(ASYNC_OPS):
+            run(reaction(keys_for(i), f"{tag}a{i}"))
+            await asyncio.sleep(0)
+    for th in threads:
+        await asyncio.get_running_loop().run_in_executor(None, th.join)
+    await repo.close()
+
+
+def main():
+    sys.setswitchinterval(1e-5)   # switch threads often to force interleavings
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        storage.BACKEND = "journal"
+        storage.DATA_FILE = tmp / "progress.json"
+        storage.JOURNAL_FILE = tmp / "progress.log"
+        # everything the repository writes beside the store stays in tmp too
+        storage.TOTALS_FILE = tmp / "leaderboard.json"
+        reports.REPORTS_DIR = tmp / "reports"
+        reports._index = None
+        archive.ARCHIVE_DIR = tmp / "archive"
+        archive.SUMMARY_FILE = archive.ARCHIVE_DIR / "summaries.json"
+        total = THREADS * OPS + ASYNC_OPS
+        for label, tag in (("unchecked", "u"), ("transactions", "x")):
+            repo = Repository()
+            run = unchecked(repo) if tag == "u" else repo.transact
+            t0 = time.perf_counter()
+            asyncio.run(run_mode(repo, run, tag))
+            elapsed = time.perf_counter() - t0
+            lost_mem = count_missing(repo._hot(), tag)
+            lost_disk = count_missing(storage.load(), tag)
+            print(f"{label:>13}: {total} writes in {elapsed:.2f}s, "
+                  f"lost {lost_mem} in memory / {lost_disk} on disk, "
+                  f"{repo.conflicts} conflicts retried, {repo.flushes} flushes")
+            if tag == "x":
+                assert lost_mem == lost_disk == 0, "transactions lost updates"
+            storage.save({})
+
+
+if __name__ == "__main__":
+    main()
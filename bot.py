@@ -3,11 +3,12 @@ import checkin_reactions
 import os
 import discord
 import asyncio
+import signal
 import reminder
+import scheduler
 import ai_updates
 from discord.ext import commands
 from discord import app_commands
-from discord.ext import tasks
 from discord import Embed
 from dotenv import load_dotenv
 from pathlib import Path
@@ -16,12 +17,16 @@ from typing import List
 import datetime as dt
 from datetime import datetime, timezone, timedelta, date
 
-from storage import load, save
+from repository import repo
+from names import names
+from team_index import popcount
+from sketches import SKETCH_ACCURACY
 from ranks import RANKS
+from rank_plan import plan_for, RANK_BY_LEVEL, LEVEL_BY_NAME, UNLOCK_LEVEL
 from habits import HABITS
-from rank_storage import load as load_group_rank, save as save_group_rank
+from storage_io import load_rank, save_rank, run as run_io
 
-from helpers import load_meta, current_week_id, display_name_for, get_week_summary, save_meta, evaluate_week, get_all_streaks, format_streak_display
+from helpers import current_week_id, get_week_summary, get_all_streaks, format_streak_display
 from helpers import LOCAL_TZ
 
 
@@ -43,15 +48,25 @@ class HabitBot(commands.Bot):
         )
     
     async def setup_hook(self):
+        names.attach(self)
+        await repo.start()
+        try:
+            # docker stop sends SIGTERM; close() flushes pending check-ins
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except NotImplementedError:
+            pass  # no loop signal handlers on Windows
         await self.tree.sync()
         print(f"Synced {len(self.tree.get_commands())} command(s)")
 
-bot = HabitBot()
+    async def close(self):
+        try:
+            await checkin_reactions.flush_bursts(self)   # reactions still in their debounce window
+            await repo.close()
+        finally:
+            await super().close()
 
-# Load data AFTER creating the bot
-GROUP_RANK = load_group_rank()
-META = load_meta()
-DATA = load()
+bot = HabitBot()
 
 # ------ channel restrictions -------
 CHANNEL_CONFIG = {
@@ -168,15 +183,13 @@ async def checkin(interaction: discord.Interaction, habits: str, day: str = "tod
     args = habits.lower().split()
     
     # Reuse existing parsing logic but adapted for slash commands
-    current_rank = load_group_rank()
-    allowed = {t["habit"] for r in RANKS[:current_rank] for t in r["tasks"]}
+    plan = plan_for(await load_rank())
     
     # Check for locked habits
     for arg in args:
         name = arg
-        if name in HABITS and name not in allowed:
-            levels = [rk["level"] for rk in RANKS if any(t["habit"] == name for t in rk["tasks"])]
-            req = next(rk for rk in RANKS if rk["level"] == min(levels))
+        if name in HABITS and name not in plan.targets:
+            req = RANK_BY_LEVEL[UNLOCK_LEVEL[name]]
             return await interaction.response.send_message(
                 f"🚫 You can't log **{name}** yet — it unlocks at "
                 f"Rank {req['level']} ({req['name'].title()}).",
@@ -207,7 +220,7 @@ async def checkin(interaction: discord.Interaction, habits: str, day: str = "tod
                 )
             if cfg.get("max") is not None and minutes > cfg["max"]:
                 return await interaction.response.send_message(
-                    f"{name} cannot exceed {cfg['max']} minutes per day.",
+                    f"{name} cannot exceed {cfg['max']} {'pages' if name == 'reading' else 'minutes'} per day.",
                     ephemeral=True
                 )
             parsed.append(f"{name}:{minutes}")
@@ -251,12 +264,14 @@ async def checkin(interaction: discord.Interaction, habits: str, day: str = "tod
 
     # Save to storage
     uid = str(interaction.user.id)
-    user_days = DATA.setdefault(week_for_storage, {}).setdefault(uid, {})
-    existing = user_days.get(day_iso, [])
     to_replace = {tok.split(':',1)[0] for tok in parsed}
-    filtered = [tok for tok in existing if tok.split(':',1)[0] not in to_replace]
-    user_days[day_iso] = filtered + parsed
-    save(DATA)
+
+    def apply(store):
+        existing = store.get_day(week_for_storage, uid, day_iso)
+        filtered = [tok for tok in existing if tok.split(':',1)[0] not in to_replace]
+        store.set_day(week_for_storage, uid, day_iso, filtered + parsed)
+
+    await repo.commit(apply)
     
     # Build response embed
     lines = []
@@ -301,8 +316,6 @@ async def checkin(interaction: discord.Interaction, habits: str, day: str = "tod
 async def progress(interaction: discord.Interaction, member: discord.Member = None):
     await interaction.response.defer()  # For longer operations
     
-    global DATA
-    DATA = load()
     summary, week = get_week_summary()
     target = member or interaction.user
     uid = str(target.id)
@@ -314,30 +327,10 @@ async def progress(interaction: discord.Interaction, member: discord.Member = No
 
     habits_done = summary[uid]
 
-    # Determine which habits are unlocked
-    current_rank = load_group_rank()
-    unlocked = []
-    for r in RANKS[:current_rank]:
-        for t in r["tasks"]:
-            if t["habit"] not in unlocked:
-                unlocked.append(t["habit"])
-
-    # Compute weekly targets per habit from RANKS (days-based tasks override default)
-    weekly_targets = {}
-    for h in unlocked:
-        day_targets = []
-        for r in RANKS[:current_rank]:
-            for t in r["tasks"]:
-                if t["habit"] == h and t["target"].endswith("days"):
-                    try:
-                        val = int(t["target"].rstrip("days"))
-                        day_targets.append(val)
-                    except ValueError:
-                        pass
-        if day_targets:
-            weekly_targets[h] = max(day_targets)
-        else:
-            weekly_targets[h] = HABITS[h].get("weekly_target", 7)
+    # Unlocked habits and their weekly targets (days-based tasks override default)
+    plan = plan_for(await load_rank())
+    unlocked = plan.habits
+    weekly_targets = plan.weekly_targets
 
     # Overall percentage
     total_done = sum(min(habits_done.get(h, 0), weekly_targets[h]) for h in unlocked)
@@ -374,10 +367,15 @@ async def progress(interaction: discord.Interaction, member: discord.Member = No
     await interaction.followup.send(embed=embed)
 
 
+def challenge_lines(plan):
+    """One line per unlocked habit with its latest target, in unlock order."""
+    return [f"- **{h.capitalize()}:** {plan.targets[h]}" for h in plan.habits]
+
+
 @bot.tree.command(name="ranks", description="Show all ranks and their challenges")
 @slash_channel_check()
 async def ranks(interaction: discord.Interaction):
-    current = load_group_rank()
+    current = await load_rank()
     
     FLAGS = {
         1: "🇮🇳", 2: "🇳🇬", 3: "🇮🇩", 4: "🇧🇷", 5: "🇿🇦",
@@ -394,7 +392,7 @@ async def ranks(interaction: discord.Interaction):
     embed = Embed(title="🏅 Rank List", colour=0x00aaff)
     embed.add_field(name="\u200b", value="\n".join(lines), inline=False)
     
-    curr = next(r for r in RANKS if r["level"] == current)
+    curr = RANK_BY_LEVEL[current]
     embed.add_field(
         name="🎖 Current Group Rank",
         value=f"**{current}. {curr['name'].title()}**",
@@ -413,29 +411,16 @@ async def ranks(interaction: discord.Interaction):
 @bot.tree.command(name="rank", description="Show current group rank and challenge")
 @slash_channel_check()
 async def rank(interaction: discord.Interaction):
-    level = load_group_rank()
-    rank_entry = next((r for r in RANKS if r["level"] == level), None)
+    level = await load_rank()
+    plan = plan_for(level)
+    rank_entry = plan.rank
     if not rank_entry:
         return await interaction.response.send_message(
             "No rank data available.",
             ephemeral=True
         )
     
-    # Build a map of habit → latest target (de-duplicating upgrades)
-    task_map = {}
-    for r in RANKS[:level]:
-        for t in r["tasks"]:
-            task_map[t["habit"]] = t["target"]
-    
-    # Preserve appearance order, but only once each habit
-    seen = set()
-    lines = []
-    for r in RANKS[:level]:
-        for t in r["tasks"]:
-            h = t["habit"]
-            if h in task_map and h not in seen:
-                lines.append(f"- **{h.capitalize()}:** {task_map[h]}")
-                seen.add(h)
+    lines = challenge_lines(plan)
     
     embed = Embed(
         title=f"🎖 Current Group Rank: {level} – {rank_entry['name'].title()}",
@@ -454,7 +439,7 @@ async def rank(interaction: discord.Interaction):
 @app_commands.describe(target="Level number or rank name to promote to")
 @app_commands.default_permissions(administrator=True)
 async def rankup(interaction: discord.Interaction, target: str = None):
-    old = load_group_rank()
+    old = await load_rank()
     
     # Determine new level
     if target is None:
@@ -463,13 +448,12 @@ async def rankup(interaction: discord.Interaction, target: str = None):
         try:
             lvl = int(target)
         except ValueError:
-            match = next((r for r in RANKS if r["name"].lower() == target.lower()), None)
-            if not match:
+            lvl = LEVEL_BY_NAME.get(target.lower())
+            if lvl is None:
                 return await interaction.response.send_message(
                     f"🚫 Invalid rank: `{target}`",
                     ephemeral=True
                 )
-            lvl = match["level"]
         new = lvl
     
     # Clamp and validate
@@ -480,24 +464,12 @@ async def rankup(interaction: discord.Interaction, target: str = None):
             ephemeral=True
         )
     
-    save_group_rank(new)
+    await save_rank(new)
     
     # Build task list
-    task_map = {}
-    for r in RANKS[:new]:
-        for t in r["tasks"]:
-            task_map[t["habit"]] = t["target"]
-    
-    seen = set()
-    lines = []
-    for r in RANKS[:new]:
-        for t in r["tasks"]:
-            h = t["habit"]
-            if h in task_map and h not in seen:
-                lines.append(f"- **{h.capitalize()}:** {task_map[h]}")
-                seen.add(h)
-    
-    rank = next(r for r in RANKS if r["level"] == new)
+    plan = plan_for(new)
+    lines = challenge_lines(plan)
+    rank = plan.rank
     embed = Embed(
         title=f"🎉 Group Promoted to Rank {new}: {rank['name'].title()}",
         colour=0x2ecc71
@@ -515,7 +487,7 @@ async def rankup(interaction: discord.Interaction, target: str = None):
 @app_commands.describe(target="Level number or rank name to demote to")
 @app_commands.default_permissions(administrator=True)
 async def rankdown(interaction: discord.Interaction, target: str = None):
-    old = load_group_rank()
+    old = await load_rank()
     
     # Determine new level
     if target is None:
@@ -524,13 +496,12 @@ async def rankdown(interaction: discord.Interaction, target: str = None):
         try:
             lvl = int(target)
         except ValueError:
-            match = next((r for r in RANKS if r["name"].lower() == target.lower()), None)
-            if not match:
+            lvl = LEVEL_BY_NAME.get(target.lower())
+            if lvl is None:
                 return await interaction.response.send_message(
                     f"🚫 Invalid rank: `{target}`",
                     ephemeral=True
                 )
-            lvl = match["level"]
         new = lvl
     
     # Clamp within bounds
@@ -542,25 +513,14 @@ async def rankdown(interaction: discord.Interaction, target: str = None):
         )
     
     # Persist new rank
-    save_group_rank(new)
+    await save_rank(new)
     
     # Build cumulative task list
-    task_map = {}
-    for r in RANKS[:new]:
-        for t in r["tasks"]:
-            task_map[t["habit"]] = t["target"]
-    
-    seen = set()
-    lines = []
-    for r in RANKS[:new]:
-        for t in r["tasks"]:
-            h = t["habit"]
-            if h in task_map and h not in seen:
-                lines.append(f"- **{h.capitalize()}:** {task_map[h]}")
-                seen.add(h)
+    plan = plan_for(new)
+    lines = challenge_lines(plan)
     
     # Announce
-    rank = next(r for r in RANKS if r["level"] == new)
+    rank = plan.rank
     embed = Embed(
         title=f"⚠️ Group Demoted to Rank {new}: {rank['name'].title()}",
         colour=0xe74c3c
@@ -592,8 +552,6 @@ async def rankdown(interaction: discord.Interaction, target: str = None):
     app_commands.Choice(name="Sunday", value="sunday"),
 ])
 async def history(interaction: discord.Interaction, member: discord.Member = None, time_filter: str = "all", week: int = 0):
-    data = load()
-    
     # Determine target member
     target = member or interaction.user
     
@@ -602,8 +560,11 @@ async def history(interaction: discord.Interaction, member: discord.Member = Non
     target_monday = current_monday + timedelta(weeks=week)
     week_id = target_monday.isoformat()
     
-    # Load target week's data
-    week_data = data.get(week_id, {})
+    # Load target week's data; closed weeks come from their frozen report
+    if week < 0:
+        week_data = (await run_io(repo.report, week_id, await load_rank()))["days"]
+    else:
+        week_data = await run_io(repo.week, week_id)
     user_days = week_data.get(str(target.id), {})
     
     if not user_days:
@@ -741,16 +702,11 @@ async def habit_autocomplete(
     interaction: discord.Interaction,
     current: str,
 ) -> List[app_commands.Choice[str]]:
-    current_rank = load_group_rank()
-    allowed = []
-    for r in RANKS[:current_rank]:
-        for t in r["tasks"]:
-            habit = t["habit"]
-            if habit not in [h.value for h in allowed]:
-                if current.lower() in habit:
-                    allowed.append(
-                        app_commands.Choice(name=habit.capitalize(), value=habit)
-                    )
+    plan = plan_for(await load_rank())
+    allowed = [
+        app_commands.Choice(name=habit.capitalize(), value=habit)
+        for habit in plan.habits if current.lower() in habit
+    ]
     return allowed[:25]  # Discord limit
 
 @bot.tree.command(name="delete", description="Delete a logged habit")
@@ -773,9 +729,6 @@ async def habit_autocomplete(
     app_commands.Choice(name="Sunday", value="sunday"),
 ])
 async def delete(interaction: discord.Interaction, habit: str, day: str = "today", week: int = 0):
-    global DATA
-    DATA = load()
-    
     habit_key = habit.lower()
     if habit_key not in HABITS:
         return await interaction.response.send_message(
@@ -817,13 +770,16 @@ async def delete(interaction: discord.Interaction, habit: str, day: str = "today
     
     # Locate and remove entry from target week
     uid = str(interaction.user.id)
-    week_data = DATA.get(target_week_id, {})
-    user_days = week_data.get(uid, {})
-    
-    tokens = user_days.get(day_iso, [])
-    filtered = [tok for tok in tokens if tok.split(":",1)[0] != habit_key]
-    
-    if len(filtered) == len(tokens):
+
+    def apply(store):
+        tokens = store.get_day(target_week_id, uid, day_iso)
+        filtered = [tok for tok in tokens if tok.split(":",1)[0] != habit_key]
+        if len(filtered) == len(tokens):
+            return False
+        store.set_day(target_week_id, uid, day_iso, filtered or None)
+        return True
+
+    if not await repo.commit(apply):
         # No entry found to delete
         week_context = ""
         if week != 0:
@@ -835,13 +791,6 @@ async def delete(interaction: discord.Interaction, habit: str, day: str = "today
             ephemeral=True
         )
     
-    # Update storage
-    if filtered:
-        user_days[day_iso] = filtered
-    else:
-        user_days.pop(day_iso, None)
-    save(DATA)
-    
     # Build response embed
     if week == 0:
         embed = Embed(
@@ -879,9 +828,6 @@ async def delete(interaction: discord.Interaction, habit: str, day: str = "today
     app_commands.Choice(name="Sunday", value="sunday"),
 ])
 async def clear_day(interaction: discord.Interaction, day: str = "today"):
-    global DATA
-    DATA = load()
-    
     # Determine date
     if day == "yesterday":
         day_date = datetime.now(LOCAL_TZ).date() - timedelta(days=1)
@@ -900,27 +846,27 @@ async def clear_day(interaction: discord.Interaction, day: str = "today"):
     target_monday = day_date - timedelta(days=day_date.weekday())
     week = target_monday.isoformat()
     
-    # Check if data exists
+    # Clear the day, keeping what was there for the response
     uid = str(interaction.user.id)
-    week_data = DATA.get(week, {})
-    user_days = week_data.get(uid, {})
-    
-    if day_iso not in user_days or not user_days[day_iso]:
+
+    def apply(store):
+        tokens = store.get_day(week, uid, day_iso)
+        if tokens:
+            store.set_day(week, uid, day_iso, None)
+        return tokens
+
+    tokens = await repo.commit(apply)
+    if not tokens:
         return await interaction.response.send_message(
             f"No check-ins found for {human_date}.",
             ephemeral=True
         )
     
-    # Store what we're clearing for the response
     cleared_habits = []
-    for token in user_days[day_iso]:
+    for token in tokens:
         habit_name = token.split(":", 1)[0]
         cleared_habits.append(habit_name.capitalize())
     
-    # Clear the day
-    user_days.pop(day_iso)
-    save(DATA)
-    
     embed = Embed(
         title="🗑️ Day Cleared",
         description=f"Cleared all check-ins for **{human_date}**",
@@ -937,14 +883,14 @@ async def clear_day(interaction: discord.Interaction, day: str = "today"):
 @bot.tree.command(name="nextchallenge", description="Preview the next rank's challenges")
 @slash_channel_check()
 async def nextchallenge(interaction: discord.Interaction):
-    next_level = load_group_rank() + 1
+    next_level = await load_rank() + 1
     if next_level > len(RANKS):
         return await interaction.response.send_message(
             "🎉 The group is already at the highest rank!",
             ephemeral=True
         )
     
-    nr = next(r for r in RANKS if r["level"] == next_level)
+    nr = RANK_BY_LEVEL[next_level]
     tasks = "\n".join(f"- **{t['habit'].capitalize()}:** {t['target']}" for t in nr["tasks"])
     
     embed = Embed(
@@ -963,8 +909,9 @@ async def nextchallenge(interaction: discord.Interaction):
 @slash_channel_check()
 async def mychallenge(interaction: discord.Interaction):
     """Display current challenges organized by daily vs other."""
-    current_rank = load_group_rank()
-    rank_entry = next((r for r in RANKS if r["level"] == current_rank), None)
+    current_rank = await load_rank()
+    plan = plan_for(current_rank)
+    rank_entry = plan.rank
     
     if not rank_entry:
         return await interaction.response.send_message(
@@ -972,37 +919,14 @@ async def mychallenge(interaction: discord.Interaction):
             ephemeral=True
         )
     
-    # Build map of all current requirements (latest version of each habit)
-    habit_targets = {}
-    for r in RANKS[:current_rank]:
-        for t in r["tasks"]:
-            habit_targets[t["habit"]] = t["target"]
-    
-    # Categorize habits
+    # Categorize habits (latest version of each requirement)
     daily_habits = []
     other_habits = []
     
-    for habit, target in habit_targets.items():
-        cfg = HABITS.get(habit, {})
-        
-        # Determine if daily
-        is_daily = (
-            target == "7days" or 
-            (cfg.get("unit") == "bool" and cfg.get("weekly_target", 0) == 7)
-        )
-        
-        # Format the display
-        if cfg.get("unit") == "minutes":
-            if habit == "reading":
-                display = f"**{habit}** - {target}"
-            else:
-                display = f"**{habit}** - {target}"
-        elif cfg.get("unit") == "bool":
-            display = f"**{habit}** - {target}"
-        else:
-            display = f"**{habit}** - {target}"
+    for habit, target in plan.targets.items():
+        display = f"**{habit}** - {target}"
         
-        if is_daily:
+        if plan.daily[habit]:
             daily_habits.append(display)
         else:
             other_habits.append(display)
@@ -1039,24 +963,12 @@ async def mychallenge(interaction: discord.Interaction):
 @bot.tree.command(name="leaderboard", description="Show cumulative habit totals")
 @slash_channel_check()
 async def leaderboard(interaction: discord.Interaction):
-    from collections import defaultdict
-    
     # Defer since this might take a moment
     await interaction.response.defer()
     
-    # Aggregate totals across every week
-    data = load()
-    totals = defaultdict(lambda: defaultdict(int))
-    
-    for week_data in data.values():
-        for uid, days in week_data.items():
-            for tokens in days.values():
-                for tok in tokens:
-                    name, *val = tok.split(":", 1)
-                    cfg = HABITS.get(name)
-                    if cfg and cfg["unit"] == "minutes":
-                        amt = int(val[0]) if val else cfg.get("min", 0)
-                        totals[uid][name] += amt
+    # Running all-time minute/page totals, maintained on every check-in.
+    # Copied, since check-ins can change the live view while names are fetched
+    totals = {uid: dict(per_habit) for uid, per_habit in repo.leaderboard().items()}
     
     # Build an embed with one field per user
     embed = Embed(
@@ -1069,19 +981,10 @@ async def leaderboard(interaction: discord.Interaction):
     def user_sum(hdict): 
         return sum(hdict.values())
     
-    # Get display names for all users
+    # Get display names for all users in one concurrent batch
+    resolved = await names.prefetch(totals)
     for uid, habit_dict in sorted(totals.items(), key=lambda kv: -user_sum(kv[1])):
-        # Try to get member from guild
-        member = interaction.guild.get_member(int(uid)) if interaction.guild else None
-        if member:
-            display = member.display_name
-        else:
-            # Try to fetch user
-            try:
-                user = await bot.fetch_user(int(uid))
-                display = user.display_name if user else uid[:6]
-            except:
-                display = uid[:6]
+        display = resolved.get(uid) or uid[:6]
         
         lines = []
         for habit, amount in sorted(habit_dict.items()):
@@ -1109,6 +1012,232 @@ async def leaderboard(interaction: discord.Interaction):
     await interaction.followup.send(embed=embed)
 
 
+TREND_WINDOWS = {"4w": 28, "3m": 91, "6m": 182, "1y": 364}
+TREND_MAX_ROWS = 31   # keeps the embed under Discord's field limit
+
+def trend_buckets(granularity: str, start: date, end: date):
+    """(label, first day, last day) buckets covering start..end."""
+    buckets = []
+    if granularity == "day":
+        day = start
+        while day <= end:
+            buckets.append((day.strftime("%a %d %b"), day, day))
+            day += timedelta(days=1)
+    elif granularity == "week":
+        monday = start - timedelta(days=start.weekday())
+        while monday <= end:
+            buckets.append((monday.strftime("%d %b"), monday, min(monday + timedelta(days=6), end)))
+            monday += timedelta(days=7)
+    else:
+        first = start.replace(day=1)
+        while first <= end:
+            following = (first + timedelta(days=32)).replace(day=1)
+            buckets.append((first.strftime("%b %Y"), first, min(following - timedelta(days=1), end)))
+            first = following
+    return buckets
+
+
+async def trends_habit_autocomplete(
+    interaction: discord.Interaction,
+    current: str,
+) -> List[app_commands.Choice[str]]:
+    logged = repo.streak_habits(str(interaction.user.id)) | set(HABITS)
+    return [
+        app_commands.Choice(name=habit.capitalize(), value=habit)
+        for habit in sorted(logged) if current.lower() in habit
+    ][:25]
+
+@bot.tree.command(name="trends", description="Show how a habit has gone over time")
+@slash_channel_check()
+@app_commands.describe(
+    habit="The habit to chart",
+    window="How far back to look",
+    granularity="Size of each row",
+    member="View another member's trends (optional)"
+)
+@app_commands.autocomplete(habit=trends_habit_autocomplete)
+@app_commands.choices(window=[
+    app_commands.Choice(name="4 weeks", value="4w"),
+    app_commands.Choice(name="3 months", value="3m"),
+    app_commands.Choice(name="6 months", value="6m"),
+    app_commands.Choice(name="1 year", value="1y"),
+], granularity=[
+    app_commands.Choice(name="Day", value="day"),
+    app_commands.Choice(name="Week", value="week"),
+    app_commands.Choice(name="Month", value="month"),
+])
+async def trends(interaction: discord.Interaction, habit: str, window: str = "3m",
+                 granularity: str = "week", member: discord.Member = None):
+    target = member or interaction.user
+    uid = str(target.id)
+    habit = habit.lower()
+    today = datetime.now(LOCAL_TZ).date()
+    start = today - timedelta(days=TREND_WINDOWS.get(window, 91) - 1)
+    
+    # every row is an O(1) difference of two prefix sums
+    engine = repo.engine()
+    rows = [(label, first, last) + engine.range(uid, habit, first, last)
+            for label, first, last in trend_buckets(granularity, start, today)]
+    days_logged, total = engine.range(uid, habit, rows[0][1], today)
+    if not days_logged:
+        return await interaction.response.send_message(
+            f"No **{habit}** check-ins for {target.display_name} in that window.", ephemeral=True)
+    
+    has_amount = HABITS.get(habit, {}).get("unit") == "minutes"
+    unit = "pages" if habit == "reading" else "min"
+    peak = max(amount if has_amount else days for _, _, _, days, amount in rows) or 1
+    lines = []
+    recent = []   # last four buckets, for the rolling average
+    for label, first, last, days, amount in rows[-TREND_MAX_ROWS:]:
+        span = (last - first).days + 1
+        shown = amount if has_amount else days
+        recent = (recent + [shown / span])[-4:]
+        bar = "█" * round(8 * shown / peak)
+        detail = f"{amount} {unit}" if has_amount else f"{days}/{span}d"
+        lines.append(f"{label:<11} {bar:<8} {detail:>10}  avg {sum(recent) / len(recent):.1f}/d")
+    
+    embed = Embed(
+        title=f"📈 {habit.capitalize()} trend for {target.display_name}",
+        description="```\n" + "\n".join(lines) + "\n```",
+        colour=0x1abc9c
+    )
+    span = (today - rows[0][1]).days + 1
+    summary = f"Logged on {days_logged} of {span} days"
+    if has_amount:
+        summary += f" • {total} {unit} total • {total / span:.1f} {unit}/day"
+    embed.set_footer(text=summary + " • avg = rolling mean of the last 4 rows")
+    if len(rows) > TREND_MAX_ROWS:
+        embed.description = f"Last {TREND_MAX_ROWS} of {len(rows)} rows\n" + embed.description
+    
+    await interaction.response.send_message(embed=embed)
+
+
+@bot.tree.command(name="team", description="Show team completion per day for this rank's habits")
+@slash_channel_check()
+@app_commands.describe(week="Week offset (0=current, -1=last week, etc.)")
+async def team(interaction: discord.Interaction, week: int = 0):
+    await interaction.response.defer()
+    
+    plan = plan_for(await load_rank())
+    today = datetime.now(LOCAL_TZ).date()
+    monday = date.fromisoformat(current_week_id()) + timedelta(weeks=min(week, 0))
+    last = min(monday + timedelta(days=6), today)
+    days = [monday + timedelta(days=i) for i in range((last - monday).days + 1)]
+    
+    # team = anyone who logged anything this week; every cell is a popcount
+    index = repo.team()
+    everyone = index.any_day(plan.habits, monday, last)
+    if not everyone:
+        return await interaction.followup.send("No check-ins from the team that week yet.")
+    size = popcount(everyone)
+    
+    header = f"{'':<12}" + " ".join(f"{d:%a}"[:2] for d in days)
+    rows = [header]
+    perfect = []
+    for habit in plan.habits:
+        cells = " ".join(f"{popcount(index.day(habit, d) & everyone):>2}" for d in days)
+        rows.append(f"{habit[:11]:<12}{cells}")
+        every = index.every_day(habit, monday, last) & everyone
+        if every and plan.daily.get(habit):
+            perfect.append((habit, index.members(every)))
+    
+    embed = Embed(
+        title="👥 Team completion",
+        description=f"Week of {monday:%d %b %Y} • members who logged each habit per day (of {size})\n"
+                    "```\n" + "\n".join(rows) + "\n```",
+        colour=0x2ecc71
+    )
+    if perfect:
+        resolved = await names.prefetch(uid for _, uids in perfect for uid in uids)
+        embed.add_field(
+            name="Every day so far",
+            value="\n".join(f"**{habit.capitalize()}:** " + ", ".join(resolved[u] or u[:6] for u in uids)
+                            for habit, uids in perfect),
+            inline=False
+        )
+    
+    await interaction.followup.send(embed=embed)
+
+
+STATS_TREND_ROWS = 8
+
+async def minutes_habit_autocomplete(
+    interaction: discord.Interaction,
+    current: str,
+) -> List[app_commands.Choice[str]]:
+    return [
+        app_commands.Choice(name=habit.capitalize(), value=habit)
+        for habit, cfg in HABITS.items() if cfg["unit"] == "minutes" and current.lower() in habit
+    ][:25]
+
+@bot.tree.command(name="stats", description="Median and p90 session for a minute/page habit")
+@slash_channel_check()
+@app_commands.describe(
+    habit="A minute or page habit",
+    window="How far back to look",
+    member="View another member's stats (optional)"
+)
+@app_commands.autocomplete(habit=minutes_habit_autocomplete)
+@app_commands.choices(window=[
+    app_commands.Choice(name="4 weeks", value="4w"),
+    app_commands.Choice(name="3 months", value="3m"),
+    app_commands.Choice(name="6 months", value="6m"),
+    app_commands.Choice(name="1 year", value="1y"),
+])
+async def stats(interaction: discord.Interaction, habit: str, window: str = "3m",
+                member: discord.Member = None):
+    habit = habit.lower()
+    if HABITS.get(habit, {}).get("unit") != "minutes":
+        return await interaction.response.send_message(
+            f"**{habit}** isn't a minute or page habit.", ephemeral=True)
+    target = member or interaction.user
+    uid = str(target.id)
+    unit = "pages" if habit == "reading" else "min"
+    
+    # one sketch per week; any range is a merge of those
+    monday = date.fromisoformat(current_week_id())
+    n_weeks = TREND_WINDOWS.get(window, 91) // 7
+    week_ids = [(monday - timedelta(weeks=i)).isoformat() for i in reversed(range(n_weeks))]
+    index = repo.sketches()
+    mine = index.weeks(uid, habit, week_ids)
+    everyone = index.weeks(None, habit, week_ids)
+    if not everyone.count:
+        return await interaction.response.send_message(
+            f"No **{habit}** logged by anyone in that window.", ephemeral=True)
+    
+    def describe(sketch):
+        if not sketch.count:
+            return "no sessions"
+        return (f"median **{sketch.quantile(0.5):.0f}** {unit} • p90 **{sketch.quantile(0.9):.0f}** {unit}"
+                f" • {sketch.count} session{'s' if sketch.count != 1 else ''}")
+    
+    embed = Embed(
+        title=f"📊 {habit.capitalize()} stats",
+        description=f"Last {n_weeks} weeks",
+        colour=0x3498db
+    )
+    embed.add_field(name=target.display_name, value=describe(mine), inline=False)
+    embed.add_field(name="Team", value=describe(everyone), inline=False)
+    
+    # trend: the window split into up to STATS_TREND_ROWS blocks of weeks
+    per_row = -(-n_weeks // STATS_TREND_ROWS)
+    lines = []
+    for i in range(0, n_weeks, per_row):
+        block = week_ids[i:i + per_row]
+        own = index.weeks(uid, habit, block)
+        team = index.weeks(None, habit, block)
+        fmt = lambda s: f"{s.quantile(0.5):>5.0f}" if s.count else "    -"
+        lines.append(f"{date.fromisoformat(block[0]):%d %b}  {fmt(own)} {fmt(team)}")
+    embed.add_field(
+        name="Median trend",
+        value="```\n" + f"{'from':<6}  {'you':>5} {'team':>5}\n" + "\n".join(lines) + "\n```",
+        inline=False
+    )
+    embed.set_footer(text=f"Quantiles are within {SKETCH_ACCURACY:.0%} of exact")
+    
+    await interaction.response.send_message(embed=embed)
+
+
 @bot.tree.command(name="dailyupdate", description="Generate AI team update (manual)")
 @slash_channel_check()
 @app_commands.default_permissions(administrator=True)
@@ -1166,15 +1295,27 @@ async def test_update_generation(interaction: discord.Interaction):
         await interaction.followup.send(f"❌ Failed to generate update: {str(e)}", ephemeral=True)
 
 
-@tasks.loop(time=dt.time(hour=22, minute=00, tzinfo=LOCAL_TZ))  # 10:00 PM Adelaide
-async def daily_update_task():
-    """Send daily updates at 9 AM Adelaide time"""
+@scheduler.job("daily_update", hour=22, grace=timedelta(hours=2))  # 10:00 PM Adelaide
+async def daily_update_task(when):
+    """Send the AI team update at 10 PM Adelaide time"""
     await ai_updates.send_daily_update(bot)
 
-@daily_update_task.before_loop
-async def before_daily_update():
-    await bot.wait_until_ready()
-    
+
+@scheduler.job("archive", hour=3, grace=timedelta(hours=21))  # 3:00 AM Adelaide
+async def archive_task(when):
+    """Move closed weeks past the retention window into the cold archive"""
+    closed = await run_io(repo.archive_closed_weeks, current_week_id())
+    if closed:
+        print(f"Archived {len(closed)} closed week(s): {', '.join(closed)}")
+
+
+@scheduler.job("freeze_report", hour=0, minute=5, grace=timedelta(hours=23))  # 12:05 AM Adelaide
+async def freeze_report_task(when):
+    """Freeze last week's report under the rank in effect as it closed"""
+    last_week = (date.fromisoformat(current_week_id()) - timedelta(weeks=1)).isoformat()
+    # a no-op once frozen, so only Monday's run (or its catch-up) writes
+    await run_io(repo.report, last_week, await load_rank(), freeze=True)
+
 
 @bot.tree.command(name="help", description="Show all available commands")
 @slash_channel_check()
@@ -1280,6 +1421,37 @@ async def help_slash(interaction: discord.Interaction):
         inline=False
     )
 
+    embed.add_field(
+        name="🔹 `/trends`",
+        value=(
+            "Chart a habit over the last 4 weeks to 1 year.\n"
+            "• habit: Start typing to see habits\n"
+            "• window / granularity: Choose from dropdowns (optional)\n"
+            "• member: Select a member (optional)"
+        ),
+        inline=False
+    )
+
+    embed.add_field(
+        name="🔹 `/team`",
+        value=(
+            "Show how many members logged each of the rank's habits per day.\n"
+            "• week: 0=current, -1=last week (optional)"
+        ),
+        inline=False
+    )
+
+    embed.add_field(
+        name="🔹 `/stats`",
+        value=(
+            "Median and p90 session for a minute/page habit, yours and the team's.\n"
+            "• habit: Start typing to see habits\n"
+            "• window: Choose from dropdown (optional)\n"
+            "• member: Select a member (optional)"
+        ),
+        inline=False
+    )
+
     embed.add_field(
         name="🔹 `/ping`",
         value="Check if the bot is responsive.",
@@ -1380,7 +1552,7 @@ async def forcecheckin(ctx, member: commands.MemberConverter, *args):
             if minutes < cfg.get("min", 0):
                 return await ctx.send(f"`{name}` must be ≥ {cfg['min']} min.")
             if cfg.get("max") is not None and minutes > cfg["max"]:
-                return await ctx.send(f"`{name}` cannot exceed {cfg['max']} min.")
+                return await ctx.send(f"`{name}` cannot exceed {cfg['max']} {'pages' if name == 'reading' else 'min'}.")
             parsed.append(f"{name}:{minutes}")
             i += 1
 
@@ -1408,12 +1580,14 @@ async def forcecheckin(ctx, member: commands.MemberConverter, *args):
 
     # Write into storage using target week
     uid = str(member.id)
-    user_days = DATA.setdefault(target_week_id, {}).setdefault(uid, {})
-    existing = user_days.get(day_iso, [])
     to_replace = {tok.split(":",1)[0] for tok in parsed}
-    filtered = [tok for tok in existing if tok.split(":",1)[0] not in to_replace]
-    user_days[day_iso] = filtered + parsed
-    save(DATA)
+
+    def apply(store):
+        existing = store.get_day(target_week_id, uid, day_iso)
+        filtered = [tok for tok in existing if tok.split(":",1)[0] not in to_replace]
+        store.set_day(target_week_id, uid, day_iso, filtered + parsed)
+
+    await repo.commit(apply)
 
     # Build feedback message
     short = []
@@ -1502,23 +1676,29 @@ async def forcedelete(ctx, member: commands.MemberConverter, *args):
     day_iso = day_date.isoformat()
     human_date = day_date.strftime("%d %b")
 
-    # Load and modify storage using target week
+    # Remove any tokens matching the specified habits
     uid = str(member.id)
-    user_days = DATA.setdefault(target_week_id, {}).setdefault(uid, {})
 
-    tokens = user_days.get(day_iso, [])
-    if not tokens:
+    def apply(store):
+        tokens = store.get_day(target_week_id, uid, day_iso)
+        if not tokens:
+            return "empty"
+        filtered = [tok for tok in tokens
+                    if tok.split(":",1)[0] not in habits_to_delete]
+        if len(filtered) == len(tokens):
+            return "unchanged"
+        store.set_day(target_week_id, uid, day_iso, filtered or None)
+        return "deleted"
+
+    outcome = await repo.commit(apply)
+    if outcome == "empty":
         week_context = ""
         if week_offset != 0:
             week_desc = f"{abs(week_offset)} week{'s' if abs(week_offset) != 1 else ''} {'ago' if week_offset < 0 else 'in future'}"
             week_context = f" ({week_desc})"
         return await ctx.send(f"No entries found for {member.display_name} on {human_date}{week_context}.")
 
-    # Remove any tokens matching the specified habits
-    filtered = [tok for tok in tokens
-                if tok.split(":",1)[0] not in habits_to_delete]
-
-    if len(filtered) == len(tokens):
+    if outcome == "unchanged":
         # nothing was removed
         week_context = ""
         if week_offset != 0:
@@ -1526,13 +1706,6 @@ async def forcedelete(ctx, member: commands.MemberConverter, *args):
             week_context = f" ({week_desc})"
         return await ctx.send(f"No matching entries for {member.display_name} on {human_date}{week_context}.")
 
-    # Save back to storage
-    if filtered:
-        user_days[day_iso] = filtered
-    else:
-        user_days.pop(day_iso)
-    save(DATA)
-
     # Build feedback message
     week_context = ""
     if week_offset != 0:
@@ -1551,7 +1724,7 @@ async def toggle_reminders(interaction: discord.Interaction):
     from helpers import toggle_user_reminders
     
     user_id = str(interaction.user.id)
-    enabled = toggle_user_reminders(user_id)
+    enabled = await run_io(toggle_user_reminders, user_id)
     
     if enabled:
         embed = Embed(
@@ -1581,6 +1754,21 @@ async def test_reminder(interaction: discord.Interaction):
     await reminder.send_daily_reminders()
 
 
+@bot.tree.command(name="devstats", description="Show storage and reaction counters (dev only)")
+@app_commands.default_permissions(administrator=True)
+async def devstats(interaction: discord.Interaction):
+    if interaction.user.id not in DEV_USER_IDS:
+        return await interaction.response.send_message("Dev only command.", ephemeral=True)
+    
+    r = checkin_reactions.stats
+    await interaction.response.send_message(
+        f"**Repository:** {repo.mutations} writes, {repo.conflicts} retried, {repo.flushes} flushes\n"
+        f"**Reactions:** {r['events']} events, {r['collapsed']} collapsed into "
+        f"{r['bursts']} bursts, {r['writes']} writes",
+        ephemeral=True
+    )
+
+
 # simple ping-pong sanity check
 @bot.tree.command(name="ping", description="Check bot responsiveness")
 async def ping(interaction: discord.Interaction):
@@ -1599,7 +1787,7 @@ async def on_ready():
                 print(f"Guild sync failed for {g.name}: {e}")
     except Exception as e:
         print(f"Top-level guild sync error: {e}")
-    # Start daily 6AM check-in poster
+    # Daily 6AM check-in poster
     checkin_reactions.setup(bot)
     print(f"Logged in as {bot.user}")
     print(f"Slash commands synced: {len(bot.tree.get_commands())}")
@@ -1608,10 +1796,9 @@ async def on_ready():
     reminder.setup_reminders(bot)
     print("Reminder system initialized")
     
-    # Start daily update task
-    if not daily_update_task.is_running():
-        daily_update_task.start()
-        print("Daily update scheduler started")
+    # One scheduler runs the check-in post, reminders, daily update and archive
+    scheduler.start(bot)
+    print("Scheduler started")
 @bot.event
 async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
     # Ignore bot's own reactions
@@ -1625,6 +1812,24 @@ async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
     await checkin_reactions.handle_reaction(bot, payload, added=False)
 
 
+# Keep the name cache warm: members the gateway stops tracking keep their
+# last name, and anyone (re)joining drops a cached miss.
+@bot.event
+async def on_member_join(member: discord.Member):
+    names.forget(member.id)
+
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    names.remember(member.id, member.display_name)
+
+
+@bot.event
+async def on_user_update(before: discord.User, after: discord.User):
+    if names.lookup(after.id)[0]:
+        names.remember(after.id, after.display_name)
+
+
 # Admin utility to (re)post a check-in embed for a specific date
 @bot.tree.command(name="postcheckin", description="Admin: Post the daily check-in embed for a date (YYYY-MM-DD, today, or yesterday)")
 @app_commands.describe(date="Date in YYYY-MM-DD or 'today'/'yesterday'")
@@ -2,25 +2,45 @@
 # Daily reaction-based check-ins for HabitBot
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 import pathlib
-import re
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 
 import discord
 from discord import Embed
-from discord.ext import tasks
 
-from helpers import LOCAL_TZ
-from storage import load as load_store, save as save_store
-from ranks import RANKS
+from helpers import LOCAL_TZ, load_meta, save_meta
+import scheduler
+import sqlite_store
+from storage import BACKEND
+from repository import repo
+from rank_plan import plan_for
 from habits import HABITS
-from rank_storage import load as load_group_rank
+from storage_io import load_rank, run as run_io
 
 # Store mapping of date -> list[message_id] (for that day's check-in posts)
 POSTS_FILE = pathlib.Path("data/checkin_posts.json")
 
+# Reactions from one user on one post within this window are applied together
+REACTION_DEBOUNCE = float(os.getenv("REACTION_DEBOUNCE_MS", "1500")) / 1000
+
+# Gap between seeded reactions on a new post
+REACTION_SEED_INTERVAL = float(os.getenv("REACTION_SEED_INTERVAL_MS", "250")) / 1000
+
+# Days between full scans of #check-ins pins for stray check-in pins
+PIN_REPAIR_DAYS = int(os.getenv("PIN_REPAIR_DAYS", "30"))
+
+# (user_id, message_id) -> {"date", "guild_id", "habits": {habit: added}, "timer"} awaiting apply
+_bursts: Dict[tuple, dict] = {}
+_applying = set()   # running burst tasks (keeps them referenced)
+# events: reactions seen on check-in posts; collapsed: folded into a pending
+# burst; bursts: bursts applied; writes: bursts that changed anything
+stats = {"events": 0, "collapsed": 0, "bursts": 0, "writes": 0}
+
 # Map habit -> emoji (single unicode each)
 EMOJI_MAP: Dict[str, str] = {
     "meditation": "🧘",
@@ -44,6 +64,8 @@ def _today_iso(d: Optional[datetime] = None) -> str:
     return (d or datetime.now(LOCAL_TZ)).date().isoformat()
 
 def _load_posts() -> Dict[str, List[int]]:
+    if BACKEND == "sqlite":
+        return sqlite_store.load_posts()
     if POSTS_FILE.exists():
         try:
             return json.loads(POSTS_FILE.read_text())
@@ -52,39 +74,30 @@ def _load_posts() -> Dict[str, List[int]]:
     return {}
 
 def _save_posts(data: Dict[str, List[int]]) -> None:
+    if BACKEND == "sqlite":
+        sqlite_store.save_posts(data)
+        return
     POSTS_FILE.parent.mkdir(parents=True, exist_ok=True)
     POSTS_FILE.write_text(json.dumps(data, indent=2))
 
-def _latest_targets_for_rank(rank: int) -> Dict[str, str]:
-    """Return habit -> latest target string among ranks <= rank."""
-    latest: Dict[str, str] = {}
-    for r in RANKS[:max(0, rank)]:
-        for t in r.get("tasks", []):
-            latest[t["habit"]] = t["target"]
-    return latest
+def _record_post(date_str: str, message_id: int) -> Dict[str, List[int]]:
+    posts = _load_posts()
+    posts.setdefault(date_str, []).append(message_id)
+    _save_posts(posts)
+    return posts
 
-def _default_token_for(habit: str, latest_target: Optional[str]) -> Tuple[str, Optional[int]]:
-    """
-    Return (token, default_numeric) for min/default check-in.
-    token     -> 'habit' for boolean habits or 'habit:<min>' for timed ones
-    default_numeric -> int minutes if applicable, else None
-    """
-    cfg = HABITS.get(habit, {})
-    unit = cfg.get("unit")
-    if unit == "bool":
-        return habit, None
-
-    # Prefer HABITS['min'] if present; otherwise parse from rank target like "30min"
-    mins = None
-    if isinstance(cfg.get("min"), int):
-        mins = cfg["min"]
-    elif latest_target:
-        m = re.search(r'(\\d+)', latest_target)
-        if m:
-            mins = int(m.group(1))
-
-    mins = mins or 0
-    return f"{habit}:{mins}", mins
+# message_id -> date of every check-in post, loaded once and kept in step by
+# post_for_date, so reactions elsewhere in the guild cost a dict lookup
+_post_dates: Optional[Dict[int, str]] = None
+
+def _index(posts: Dict[str, List[int]]) -> Dict[int, str]:
+    return {int(mid): d for d, ids in posts.items() for mid in ids}
+
+async def _post_date(message_id: int) -> Optional[str]:
+    global _post_dates
+    if _post_dates is None:
+        _post_dates = _index(await run_io(_load_posts))
+    return _post_dates.get(message_id)
 
 def _strip_name(token: str) -> str:
     return token.split(':', 1)[0]
@@ -94,6 +107,7 @@ async def post_for_date(bot: discord.Client, target_date_str: Optional[str] = No
     Post the daily check-in embed to #check-ins for the given local date (ISO string).
     Returns list of message IDs posted.
     """
+    global _post_dates
     target_date_str = target_date_str or _today_iso()
     guild = discord.utils.get(bot.guilds)  # single-server assumption OK for this bot
     if not guild:
@@ -102,16 +116,15 @@ async def post_for_date(bot: discord.Client, target_date_str: Optional[str] = No
     if not checkins_channel:
         return []
 
-    rank = load_group_rank() or 7  # default to 7 if not set
-    latest = _latest_targets_for_rank(rank)
+    plan = plan_for((await load_rank()) or 7)  # default to 7 if not set
 
     # Keep habits only if they exist at this rank and have an emoji mapping
-    unlocked_habits = [h for h in EMOJI_MAP.keys() if h in latest]
+    unlocked_habits = [h for h in EMOJI_MAP.keys() if h in plan.targets]
 
     # Build embed description
     lines = []
     for h in unlocked_habits:
-        token, mins = _default_token_for(h, latest.get(h))
+        mins = plan.minimums[h]
         unit = HABITS.get(h, {}).get("unit")
         unit_lbl = "pages" if h == "reading" else ("min" if unit == "minutes" else (unit or ""))
         suffix = f" — min {mins} {unit_lbl}" if mins is not None else ""
@@ -122,53 +135,107 @@ async def post_for_date(bot: discord.Client, target_date_str: Optional[str] = No
     embed = Embed(title=title, description=desc, colour=0x2ecc71)
     embed.set_footer(text="React to log today. Use /checkin to log custom values.")
 
+    started = time.perf_counter()
     msg = await checkins_channel.send(embed=embed)
-    for h in unlocked_habits:
-        try:
-            await msg.add_reaction(EMOJI_MAP[h])
-        except discord.HTTPException:
-            pass
 
-    # Remember message id under that date
-    posts = _load_posts()
-    posts.setdefault(target_date_str, [])
-    posts[target_date_str].append(msg.id)
-    _save_posts(posts)
+    # Remember message id under that date (reactions on it count from now on)
+    # read-modify-write in one storage job, so two posts at once both stick
+    posts = await run_io(_record_post, target_date_str, msg.id)
+    _post_dates = _index(posts)
 
-    # Pin today's message; unpin older daily check-in pins by this bot
+    # Pin today's message; unpin the one pinned before it
     try:
         await msg.pin(reason="Daily check-in")
-        pins = await checkins_channel.pins()
-        for p in pins:
-            if p.id != msg.id and p.author.id == bot.user.id:
-                # Unpin older check-in pins
+        await _rotate_pin(bot, checkins_channel, msg.id)
+    except discord.HTTPException:
+        pass
+
+    # Seed the habit reactions in the background, paced to the reactions bucket
+    task = asyncio.get_running_loop().create_task(
+        _seed_reactions(msg, [EMOJI_MAP[h] for h in unlocked_habits], target_date_str, started))
+    _seeding.add(task)
+    task.add_done_callback(_seeding.discard)
+    print(f"Check-in post for {target_date_str} recorded and pinned in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    return [msg.id]
+
+async def _rotate_pin(bot: discord.Client, channel: discord.TextChannel, new_id: int):
+    """Unpin the previously tracked check-in post and track new_id instead.
+
+    Only that one message is touched. Every PIN_REPAIR_DAYS, or when no
+    pin is tracked, the full pin list is scanned for strays as well.
+    """
+    meta = await run_io(load_meta)
+    old_id = meta.get("checkin_pin")
+    if old_id and old_id != new_id:
+        try:
+            await channel.get_partial_message(old_id).unpin(reason="Rotate daily check-in pin")
+        except discord.HTTPException:
+            pass   # already unpinned or deleted
+    today = _today_iso()
+    last_repair = meta.get("checkin_pin_repair")
+    due = (not old_id or not last_repair
+           or (datetime.fromisoformat(today) - datetime.fromisoformat(last_repair)).days >= PIN_REPAIR_DAYS)
+    if due:
+        for p in await channel.pins():
+            if p.id != new_id and p.author.id == bot.user.id:
                 try:
                     await p.unpin(reason="Rotate daily check-in pin")
                 except discord.HTTPException:
                     pass
-    except discord.HTTPException:
-        pass
+    # read-modify-write in one storage job, so concurrent meta writers don't clobber
+    await run_io(_save_pin, new_id, today if due else None)
 
-    return [msg.id]
+def _save_pin(pin_id: int, repaired: Optional[str]):
+    meta = load_meta()
+    meta["checkin_pin"] = pin_id
+    if repaired:
+        meta["checkin_pin_repair"] = repaired
+    save_meta(meta)
 
-_bot_ref: Optional[discord.Client] = None
+_seeding = set()   # running seed tasks (keeps them referenced)
+
+def _retry_after(e: Exception) -> float:
+    if isinstance(e, discord.RateLimited):
+        return e.retry_after
+    try:
+        return float(e.response.headers.get("Retry-After", REACTION_SEED_INTERVAL))
+    except (AttributeError, TypeError, ValueError):
+        return REACTION_SEED_INTERVAL
+
+async def _seed_reactions(msg: discord.Message, emojis: List[str], date_str: str, started: float):
+    """Add the habit reactions one per REACTION_SEED_INTERVAL (the reaction
+    route allows one every 250 ms), sleeping out any 429 instead of skipping."""
+    seeded = 0
+    for i, emoji in enumerate(emojis):
+        if i:
+            await asyncio.sleep(REACTION_SEED_INTERVAL)
+        for _ in range(5):
+            try:
+                await msg.add_reaction(emoji)
+                seeded += 1
+                break
+            except discord.RateLimited as e:
+                await asyncio.sleep(_retry_after(e))
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    break
+                await asyncio.sleep(_retry_after(e))
+    print(f"Check-in post for {date_str}: {seeded}/{len(emojis)} reactions seeded, "
+          f"{time.perf_counter() - started:.1f} s end to end")
 
-@tasks.loop(minutes=1)
-async def _checkin_poster():
-    now = datetime.now(LOCAL_TZ)
-    if now.hour == 6 and now.minute == 0:
-        await post_for_date(_bot_ref, _today_iso(now))
+_bot_ref: Optional[discord.Client] = None
 
-@_checkin_poster.before_loop
-async def _before_loop():
-    await _bot_ref.wait_until_ready()
+@scheduler.job("checkin_post", hour=6, grace=timedelta(hours=12))
+async def _checkin_poster(when: datetime):
+    """Post the day's check-in at 06:00 (or late, after a restart that morning)."""
+    await post_for_date(_bot_ref, _today_iso(when))
 
 def setup(bot: discord.Client):
-    """Call from bot.py to start the 06:00 poster loop."""
+    """Call from bot.py so the scheduled 06:00 post knows the bot."""
     global _bot_ref
     _bot_ref = bot
-    if not _checkin_poster.is_running():
-        _checkin_poster.start()
 
 async def _log(bot: discord.Client, guild_id: int, text: str):
     guild = bot.get_guild(guild_id)
@@ -188,14 +255,11 @@ async def handle_reaction(bot: discord.Client, payload: discord.RawReactionActio
     - Add: log default/min token IF the user didn't already log a custom value via /checkin.
     - Remove: undo only the default/min token (keep custom values).
     - Reactions map to the date of the original post (backfill enabled).
+    - A user's reactions on one post within REACTION_DEBOUNCE_MS are folded
+      into one net change, written once and logged in one line.
     """
     # Only operate on our check-in messages
-    posts = _load_posts()
-    target_date = None
-    for d, ids in posts.items():
-        if payload.message_id in ids:
-            target_date = d
-            break
+    target_date = await _post_date(payload.message_id)
     if not target_date:
         return
 
@@ -203,45 +267,95 @@ async def handle_reaction(bot: discord.Client, payload: discord.RawReactionActio
     habit = EMOJI_TO_HABIT.get(str(payload.emoji))
     if not habit:
         # Auto-remove non-mapped reactions to keep the message tidy
-        try:
-            channel = bot.get_channel(payload.channel_id)
-            if channel:
-                msg = await channel.fetch_message(payload.message_id)
-                user = bot.get_user(payload.user_id)
-                if user:
-                    await msg.remove_reaction(payload.emoji, user)
-        except Exception:
-            pass
+        # (partial message: one DELETE, no fetch of the message or user)
+        if added:
+            try:
+                msg = bot.get_partial_messageable(payload.channel_id).get_partial_message(payload.message_id)
+                await msg.remove_reaction(payload.emoji, discord.Object(payload.user_id))
+            except Exception:
+                pass
         return
 
-    # Prepare storage
-    data = load_store()
+    # Fold into this user's burst on this post; applied when the window ends
+    key = (payload.user_id, payload.message_id)
+    stats["events"] += 1
+    burst = _bursts.get(key)
+    if burst is None:
+        burst = _bursts[key] = {"date": target_date, "guild_id": payload.guild_id, "habits": {}}
+        burst["timer"] = asyncio.get_running_loop().call_later(
+            REACTION_DEBOUNCE, _start_burst, bot, key)
+    else:
+        stats["collapsed"] += 1
+    burst["habits"].pop(habit, None)
+    burst["habits"][habit] = added   # last tap wins; order kept for the log line
+
+
+def _start_burst(bot: discord.Client, key):
+    task = asyncio.get_running_loop().create_task(_apply_burst(bot, key))
+    _applying.add(task)
+    task.add_done_callback(_applying.discard)
+
+async def flush_bursts(bot: discord.Client):
+    """Apply every pending burst now and wait for them (shutdown path)."""
+    for key in list(_bursts):
+        _bursts[key]["timer"].cancel()
+        _start_burst(bot, key)
+    if _applying:
+        await asyncio.gather(*_applying, return_exceptions=True)
+
+async def _apply_burst(bot: discord.Client, key):
+    """Apply one user's folded reactions on one post as a single write and log line."""
+    burst = _bursts.pop(key, None)
+    if burst is None:
+        return   # already applied by flush_bursts
+    user_id = str(key[0])
+    target_date = burst["date"]
     dt_obj = datetime.fromisoformat(target_date)
     monday = dt_obj - timedelta(days=dt_obj.weekday())
     week_id = monday.date().isoformat()
 
-    user_id = str(payload.user_id)
-    day_tasks: List[str] = data.setdefault(week_id, {}).setdefault(user_id, {}).setdefault(target_date, [])
-
-    rank = load_group_rank() or 7
-    latest = _latest_targets_for_rank(rank)
-    default_token, _ = _default_token_for(habit, latest.get(habit))
-
-    # Respect custom values
-    existing_for_habit = [t for t in day_tasks if _strip_name(t) == habit]
-    has_custom = any(t != default_token for t in existing_for_habit)
-
-    if added:
-        if has_custom:
-            # Command-entered custom value wins; do nothing.
-            return
-        # Replace any previous entries for this habit with the default token
-        day_tasks[:] = [t for t in day_tasks if _strip_name(t) != habit] + [default_token]
-        save_store(data)
-        await _log(bot, payload.guild_id, f"✅ <@{payload.user_id}> checked **{habit}** for **{target_date}**.")
-    else:
-        # Remove only the default token; keep custom values
-        if default_token in day_tasks and not has_custom:
-            day_tasks.remove(default_token)
-            save_store(data)
-            await _log(bot, payload.guild_id, f"↩️ <@{payload.user_id}> unchecked **{habit}** for **{target_date}**.")
+    plan = plan_for((await load_rank()) or 7)
+
+    def apply(store) -> List[tuple]:
+        day_tasks = store.get_day(week_id, user_id, target_date)
+        changed = []
+        for habit, added in burst["habits"].items():
+            default_token = plan.default_tokens[habit]
+
+            # Respect custom values
+            existing_for_habit = [t for t in day_tasks if _strip_name(t) == habit]
+            has_custom = any(t != default_token for t in existing_for_habit)
+
+            if added:
+                if has_custom or existing_for_habit == [default_token]:
+                    # Command-entered custom value wins; already checked is a no-op.
+                    continue
+                # Replace any previous entries for this habit with the default token
+                day_tasks = [t for t in day_tasks if _strip_name(t) != habit] + [default_token]
+                changed.append((habit, True))
+            # Remove only the default token; keep custom values
+            elif default_token in day_tasks and not has_custom:
+                day_tasks.remove(default_token)
+                changed.append((habit, False))
+        if changed:
+            store.set_day(week_id, user_id, target_date, day_tasks)
+        return changed
+
+    stats["bursts"] += 1
+    try:
+        changed = await repo.commit(apply)
+    except Exception as e:
+        print(f"⚠️ reaction check-in for {user_id} on {target_date} failed: {e}")
+        return
+    if not changed:
+        return
+    stats["writes"] += 1
+    checked = [h for h, added in changed if added]
+    unchecked = [h for h, added in changed if not added]
+    parts = []
+    if checked:
+        parts.append("checked " + ", ".join(f"**{h}**" for h in checked))
+    if unchecked:
+        parts.append("unchecked " + ", ".join(f"**{h}**" for h in unchecked))
+    icon = "✅" if checked else "↩️"
+    await _log(bot, burst["guild_id"], f"{icon} <@{user_id}> {' and '.join(parts)} for **{target_date}**.")
@@ -4,6 +4,7 @@ HABITS = {
     "meditation": {
         "unit": "minutes",
         "min": 30,
+        "max": 1440,
         "reply": lambda mins: f"**meditation** for **{mins} min**",
     },
     "exercise": {
@@ -14,6 +15,7 @@ HABITS = {
     "reading": {
         "unit": "minutes",    # pages
         "min": 10,
+        "max": 2000,
         "reply": lambda pages: f"**reading** for **{pages} pages**",
     },
     "walking": {
@@ -54,6 +56,7 @@ HABITS = {
     "digitaldetox": {
         "unit": "minutes",
         "min": 15,
+        "max": 1440,
         "reply": lambda mins: f"**digital detox** for **{mins} min**",
     },
 }
\ No newline at end of file
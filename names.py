@@ -0,0 +1,109 @@
+# names.py
+# Shared user_id -> display name resolution. Guild members the gateway has
+# cached are free; everyone else goes through a TTL'd LRU cache in front of
+# bot.fetch_user. Users Discord no longer knows are cached as misses for a
+# shorter time, and prefetch() resolves every unknown ID of a command at
+# once, NAME_FETCH_CONCURRENCY requests at a time.
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import discord
+
+NAME_TTL_S = float(os.getenv("NAME_TTL_S", "3600"))
+NAME_MISS_TTL_S = float(os.getenv("NAME_MISS_TTL_S", "600"))
+NAME_CACHE_SIZE = int(os.getenv("NAME_CACHE_SIZE", "1024"))
+NAME_FETCH_CONCURRENCY = int(os.getenv("NAME_FETCH_CONCURRENCY", "4"))
+
+
+class NameCache:
+    def __init__(self):
+        self.bot = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()   # uid -> (name or None, expires)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._slots = None   # (loop, asyncio.Semaphore)
+        self.hits = self.misses = self.fetches = 0
+
+    def attach(self, bot):
+        self.bot = bot
+
+    # ---------- cache ----------
+    def remember(self, uid, name: Optional[str], ttl: float = NAME_TTL_S):
+        uid = str(uid)
+        self._entries[uid] = (name, time.monotonic() + ttl)
+        self._entries.move_to_end(uid)
+        while len(self._entries) > NAME_CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+    def forget(self, uid):
+        self._entries.pop(str(uid), None)
+
+    def _member_name(self, uid: str) -> Optional[str]:
+        for guild in self.bot.guilds if self.bot else ():
+            member = guild.get_member(int(uid))
+            if member:
+                return member.display_name
+        return None
+
+    def lookup(self, uid) -> Tuple[bool, Optional[str]]:
+        """(known, name) without any REST call; name is None for cached misses."""
+        uid = str(uid)
+        name = self._member_name(uid)
+        if name:
+            return True, name
+        entry = self._entries.get(uid)
+        if entry is None:
+            return False, None
+        if entry[1] < time.monotonic():
+            del self._entries[uid]
+            return False, None
+        self._entries.move_to_end(uid)
+        return True, entry[0]
+
+    # ---------- fetching ----------
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots[0] is not loop:
+            self._slots = (loop, asyncio.Semaphore(NAME_FETCH_CONCURRENCY))
+        return self._slots[1]
+
+    async def _fetch(self, uid: str) -> Optional[str]:
+        self.fetches += 1
+        async with self._semaphore():
+            try:
+                user = await self.bot.fetch_user(int(uid))
+            except discord.NotFound:
+                self.remember(uid, None, NAME_MISS_TTL_S)
+                return None
+            except (discord.HTTPException, ValueError):
+                return None   # transient: don't cache
+        self.remember(uid, user.display_name)
+        return user.display_name
+
+    async def resolve(self, uid) -> Optional[str]:
+        """Display name for uid, or None if it can't be resolved."""
+        uid = str(uid)
+        known, name = self.lookup(uid)
+        if known:
+            self.hits += 1
+            return name
+        self.misses += 1
+        if self.bot is None:
+            return None
+        # one request per ID, however many callers want it at once
+        fut = self._inflight.get(uid)
+        if fut is None:
+            fut = self._inflight[uid] = asyncio.ensure_future(self._fetch(uid))
+            fut.add_done_callback(lambda _: self._inflight.pop(uid, None))
+        return await asyncio.shield(fut)
+
+    async def prefetch(self, uids: Iterable) -> Dict[str, Optional[str]]:
+        """Resolve every uid concurrently; returns {uid: name or None}."""
+        uids = list(dict.fromkeys(str(u) for u in uids))
+        found = await asyncio.gather(*(self.resolve(u) for u in uids))
+        return dict(zip(uids, found))
+
+
+names = NameCache()
@@ -0,0 +1,153 @@
+# packed.py
+# Compact binary encoding of the progress store.
+#
+# Layout (little-endian):
+#   b"HBP1" | u32 header length | header JSON | week blocks...
+#
+# The header interns habit names and user IDs and indexes every week's
+# block by (offset, length), so one week can be decoded without touching
+# the rest. A week block is, per user:
+#   u16 user index | u16 entry count | i8[n] day offsets from the week's
+#   Monday | u16[n] habit index | i32[n] value (-1 = no value)
+# Habit index 0xFFFF marks a day that is present but empty.
+import json
+import struct
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+MAGIC = b"HBP1"
+NO_VALUE = -1
+EMPTY_DAY = 0xFFFF
+MAX_VALUE = 2 ** 31 - 1   # i32 value field
+
+
+def _split(token: str) -> Tuple[str, int]:
+    name, sep, val = token.partition(":")
+    if not sep:
+        return name, NO_VALUE
+    # only values that come back byte-for-byte: ASCII, no leading zeros, fits i32
+    if val.isascii() and val.isdigit() and str(int(val)) == val and int(val) <= MAX_VALUE:
+        return name, int(val)
+    return token, NO_VALUE   # odd value: intern the whole token
+
+
+def _join(habit: str, value: int) -> str:
+    return habit if value == NO_VALUE else f"{habit}:{value}"
+
+
+def encode(data: dict) -> bytes:
+    habits: Dict[str, int] = {}
+    users: Dict[str, int] = {}
+    blocks: List[bytes] = []
+    index = []
+    pos = 0
+    for week_id, week in data.items():
+        monday = date.fromisoformat(week_id)
+        parts = []
+        for uid, days in week.items():
+            offsets, ids, values = [], [], []
+            for day_iso, tokens in days.items():
+                off = (date.fromisoformat(day_iso) - monday).days
+                if not tokens:
+                    offsets.append(off)
+                    ids.append(EMPTY_DAY)
+                    values.append(NO_VALUE)
+                for tok in tokens:
+                    name, val = _split(tok)
+                    offsets.append(off)
+                    ids.append(habits.setdefault(name, len(habits)))
+                    values.append(val)
+            n = len(offsets)
+            parts.append(struct.pack(f"<HH{n}b{n}H{n}i",
+                                     users.setdefault(uid, len(users)), n,
+                                     *offsets, *ids, *values))
+        block = b"".join(parts)
+        index.append([week_id, pos, len(block)])
+        blocks.append(block)
+        pos += len(block)
+    header = json.dumps({"habits": list(habits), "users": list(users), "weeks": index},
+                        separators=(",", ":")).encode()
+    return MAGIC + struct.pack("<I", len(header)) + header + b"".join(blocks)
+
+
+def _decode_block(block: bytes, week_id: str, habits: List[str], users: List[str],
+                  token_cache: dict = None) -> dict:
+    monday = date.fromisoformat(week_id)
+    day_names = {}
+    tokens_for = {} if token_cache is None else token_cache
+    week = {}
+    pos = 0
+    while pos < len(block):
+        uidx, n = struct.unpack_from("<HH", block, pos)
+        pos += 4
+        fields = struct.unpack_from(f"<{n}b{n}H{n}i", block, pos)
+        pos += n * 7
+        days = week.setdefault(users[uidx], {})
+        for off, hid, val in zip(fields[:n], fields[n:2 * n], fields[2 * n:]):
+            day_iso = day_names.get(off)
+            if day_iso is None:
+                day_iso = day_names[off] = (monday + timedelta(days=off)).isoformat()
+            tokens = days.get(day_iso)
+            if tokens is None:
+                tokens = days[day_iso] = []
+            if hid != EMPTY_DAY:
+                tok = tokens_for.get((hid, val))
+                if tok is None:
+                    tok = tokens_for[(hid, val)] = _join(habits[hid], val)
+                tokens.append(tok)
+    return week
+
+
+def _parse_header(buf: bytes):
+    if buf[:4] != MAGIC:
+        raise ValueError("not a packed progress file")
+    (hlen,) = struct.unpack_from("<I", buf, 4)
+    return json.loads(buf[8:8 + hlen]), 8 + hlen
+
+
+def decode(buf: bytes) -> dict:
+    header, base = _parse_header(buf)
+    token_cache = {}
+    return {
+        week_id: _decode_block(buf[base + off:base + off + length], week_id,
+                               header["habits"], header["users"], token_cache)
+        for week_id, off, length in header["weeks"]
+    }
+
+
+def decode_week(buf: bytes, week_id: str) -> dict:
+    header, base = _parse_header(buf)
+    for wid, off, length in header["weeks"]:
+        if wid == week_id:
+            return _decode_block(buf[base + off:base + off + length], week_id,
+                                 header["habits"], header["users"])
+    return {}
+
+
+# ---------- file helpers ----------
+def dump(data: dict, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(encode(data))
+    tmp.replace(path)
+
+
+def load(path: Path) -> dict:
+    return decode(path.read_bytes()) if path.exists() else {}
+
+
+def load_week(path: Path, week_id: str) -> dict:
+    """Decode one week, reading only the header and that week's block."""
+    if not path.exists():
+        return {}
+    with path.open("rb") as f:
+        head = f.read(8)
+        if head[:4] != MAGIC:
+            raise ValueError("not a packed progress file")
+        (hlen,) = struct.unpack_from("<I", head, 4)
+        header = json.loads(f.read(hlen))
+        for wid, off, length in header["weeks"]:
+            if wid == week_id:
+                f.seek(8 + hlen + off)
+                return _decode_block(f.read(length), week_id, header["habits"], header["users"])
+    return {}
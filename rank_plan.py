@@ -0,0 +1,72 @@
+# rank_plan.py
+# Everything the commands derive from RANKS for a group rank level, worked
+# out once per level: unlocked habits, latest targets, weekly targets,
+# minimum values and daily/other classification.
+import re
+from typing import Dict, List, Optional
+
+from habits import HABITS
+from ranks import RANKS
+
+RANK_BY_LEVEL: Dict[int, dict] = {r["level"]: r for r in RANKS}
+LEVEL_BY_NAME: Dict[str, int] = {r["name"].lower(): r["level"] for r in RANKS}
+
+# habit -> the first rank level whose challenge includes it
+UNLOCK_LEVEL: Dict[str, int] = {}
+for _r in RANKS:
+    for _t in _r["tasks"]:
+        UNLOCK_LEVEL.setdefault(_t["habit"], _r["level"])
+
+
+class RankPlan:
+    def __init__(self, level: int):
+        ranks = RANKS[:max(0, min(level, len(RANKS)))]
+        tasks = [t for r in ranks for t in r["tasks"]]
+        self.level = level
+        self.rank: Optional[dict] = RANK_BY_LEVEL.get(level)
+
+        # unlocked habits in first-unlock order, each with its latest target
+        self.habits: List[str] = list(dict.fromkeys(t["habit"] for t in tasks))
+        self.targets: Dict[str, str] = {t["habit"]: t["target"] for t in tasks}
+
+        # latest task dict per habit, ordered by where that latest task sits
+        latest = {t["habit"]: t for t in tasks}
+        self.challenges: List[dict] = [t for t in tasks if latest[t["habit"]] is t]
+
+        # days-based targets ("4days") win; otherwise the habit's default
+        self.weekly_targets: Dict[str, int] = {}
+        for h in self.habits:
+            days = [int(t["target"][:-4]) for t in tasks
+                    if t["habit"] == h and t["target"].endswith("days") and t["target"][:-4].isdigit()]
+            self.weekly_targets[h] = max(days) if days else HABITS.get(h, {}).get("weekly_target", 7)
+
+        self.daily: Dict[str, bool] = {}
+        for h, target in self.targets.items():
+            cfg = HABITS.get(h, {})
+            self.daily[h] = target == "7days" or (cfg.get("unit") == "bool" and cfg.get("weekly_target", 0) == 7)
+
+        # value logged by a bare check-in (reactions), for every known habit:
+        # HABITS' min, else the number in the latest target; None for bool habits
+        self.minimums: Dict[str, Optional[int]] = {}
+        self.default_tokens: Dict[str, str] = {}
+        for h in dict.fromkeys(list(HABITS) + self.habits):
+            cfg = HABITS.get(h, {})
+            if cfg.get("unit") == "bool":
+                mins = None
+            elif isinstance(cfg.get("min"), int):
+                mins = cfg["min"]
+            else:
+                m = re.search(r"(\d+)", self.targets.get(h, ""))
+                mins = int(m.group(1)) if m else 0
+            self.minimums[h] = mins
+            self.default_tokens[h] = h if mins is None else f"{h}:{mins}"
+
+
+_plans: Dict[int, RankPlan] = {}
+
+def plan_for(level: int) -> RankPlan:
+    """The (cached) plan for a group rank level."""
+    plan = _plans.get(level)
+    if plan is None:
+        plan = _plans[level] = RankPlan(level)
+    return plan
@@ -2,12 +2,32 @@
 import json
 from pathlib import Path
 
+import sqlite_store
+from storage import BACKEND
+
 FILE = Path("data/rank.json")
 
+# (mtime_ns, size) of FILE -> parsed rank; every command asks for the rank,
+# so only re-read it when the file actually changed.
+_cache = None
+
 def load():
-    if FILE.exists():
-        return json.loads(FILE.read_text()).get("rank", 1)
-    return 1
+    global _cache
+    if BACKEND == "sqlite":
+        return sqlite_store.load_rank()
+    try:
+        st = FILE.stat()
+    except FileNotFoundError:
+        return 1
+    sig = (st.st_mtime_ns, st.st_size)
+    if _cache is None or _cache[0] != sig:
+        _cache = (sig, json.loads(FILE.read_text()).get("rank", 1))
+    return _cache[1]
 
 def save(rank: int):
-    FILE.write_text(json.dumps({"rank": rank}, indent=2))
\ No newline at end of file
+    global _cache
+    if BACKEND == "sqlite":
+        sqlite_store.save_rank(rank)
+        return
+    FILE.write_text(json.dumps({"rank": rank}, indent=2))
+    _cache = None
\ No newline at end of file
@@ -1,12 +1,12 @@
 # reminder.py - Reminder system helper functions for HabitBot
 
 import discord
-from discord.ext import tasks
 from discord import Embed
-import datetime as dt
 from datetime import datetime, timedelta
 
 from helpers import get_users_needing_reminders, LOCAL_TZ
+from storage_io import run as run_io
+import scheduler
 
 # Global reference to bot - will be set when imported
 bot = None
@@ -15,15 +15,10 @@ def setup_reminders(bot_instance):
     """Initialize the reminder system with bot instance"""
     global bot
     bot = bot_instance
-    
-    # Start the daily task
-    if not daily_reminder_task.is_running():
-        daily_reminder_task.start()
-        print("Daily reminder task started")
 
-# Scheduled task for daily reminders
-@tasks.loop(time=dt.time(hour=20, minute=30, tzinfo=LOCAL_TZ))  # 8:30 PM Adelaide Time
-async def daily_reminder_task():
+# Scheduled job for daily reminders
+@scheduler.job("reminders", hour=20, minute=30, grace=timedelta(hours=3))  # 8:30 PM Adelaide Time
+async def daily_reminder_task(when):
     """Send daily reminders to users who haven't checked in"""
     try:
         await send_daily_reminders()
@@ -36,7 +31,7 @@ async def send_daily_reminders():
         print("Bot not initialized for reminders")
         return
         
-    users_needing_reminders = get_users_needing_reminders()
+    users_needing_reminders = await run_io(get_users_needing_reminders)
     if not users_needing_reminders:
         print("No users need reminders today")
         return
@@ -78,9 +73,3 @@ async def send_daily_reminders():
             print(f"Error processing reminder for {user_id}: {e}")
     
     print(f"Sent {reminder_count} daily reminders")
-
-def stop_reminder_task():
-    """Stop the reminder task (for cleanup)"""
-    if daily_reminder_task.is_running():
-        daily_reminder_task.stop()
-        print("Daily reminder task stopped")
\ No newline at end of file
@@ -0,0 +1,76 @@
+# reports.py
+# Frozen reports for closed weeks: raw days, per-user counts and totals, and
+# pass/fail against the challenge in effect, written once to
+# data/reports/<week>.json. The repository owns them: it serves the cached
+# copy and refreezes a week at the next flush after a backdated write.
+import json
+import os
+from pathlib import Path
+from typing import Optional, Set
+
+import archive
+from habits import HABITS
+from rank_plan import plan_for
+
+REPORTS_DIR = Path("data/reports")
+
+_index: Optional[Set[str]] = None   # week ids with a report on disk
+
+
+def _file(week_id: str) -> Path:
+    return REPORTS_DIR / f"{week_id}.json"
+
+
+def load_index():
+    """Scan REPORTS_DIR once; has() is a set lookup from then on."""
+    global _index
+    if _index is None:
+        _index = {p.stem for p in REPORTS_DIR.glob("*.json")} if REPORTS_DIR.exists() else set()
+
+
+def has(week_id: str) -> bool:
+    load_index()
+    return week_id in _index
+
+
+def load(week_id: str) -> Optional[dict]:
+    if not has(week_id):
+        return None
+    try:
+        return json.loads(_file(week_id).read_text())
+    except FileNotFoundError:
+        _index.discard(week_id)
+        return None
+
+
+def save(report: dict):
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = _file(report["week"])
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(report, separators=(",", ":")))
+    os.replace(tmp, path)
+    if not has(report["week"]):
+        _index.add(report["week"])
+
+
+def build(week_id: str, week, level: int) -> dict:
+    """Report for one {user_id: {day_iso: [tokens]}} week under rank `level`.
+
+    Same rule as the weekly evaluation: the group ranks up when everyone
+    met every target and down when everyone missed at least one.
+    """
+    days = {uid: {d: list(t) for d, t in per_day.items()} for uid, per_day in week.items()}
+    summary = archive.summarize(days)
+    counts = {uid: {h: s["count"] for h, s in per.items()} for uid, per in summary.items()}
+    totals = {uid: {h: s["total"] for h, s in per.items() if s["total"]} for uid, per in summary.items()}
+    targets = {t["habit"]: HABITS.get(t["habit"], {}).get("weekly_target", 7)
+               for t in plan_for(level).challenges}
+    missed = {uid: [h for h, n in targets.items() if counts.get(uid, {}).get(h, 0) < n] for uid in counts}
+    if all(not m for m in missed.values()):
+        outcome = "up"
+    elif all(missed.values()):
+        outcome = "down"
+    else:
+        outcome = "stay"
+    return {"week": week_id, "rank": level, "targets": targets, "days": days,
+            "counts": counts, "totals": totals, "missed": missed, "outcome": outcome}
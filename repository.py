@@ -0,0 +1,511 @@
+# repository.py
+# The one in-process copy of the progress store. Every reader and writer
+# goes through `repo`. Writes change memory right away and reach disk
+# write-behind: commit() callers wait for the next group flush (about
+# COMMIT_WINDOW_MS), and a timer every FLUSH_INTERVAL_S flushes anything
+# still dirty, including days whose earlier flush failed. Mutations run as
+# optimistic transactions versioned per (week, user). Flushes write a
+# snapshot on the storage_io worker, so disk time never holds the lock.
+import asyncio
+import itertools
+import os
+import threading
+from collections.abc import Mapping
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Set, Tuple
+
+import analytics
+import archive
+import reports
+import storage
+import storage_io
+from sketches import SketchIndex
+from streak_index import StreakIndex
+from team_index import TeamIndex
+
+COMMIT_WINDOW = float(os.getenv("COMMIT_WINDOW_MS", "50")) / 1000
+FLUSH_INTERVAL = float(os.getenv("FLUSH_INTERVAL_S", "5"))
+TXN_RETRIES = int(os.getenv("TXN_RETRIES", "8"))
+
+
+class _View(Mapping):
+    """Read-only view over the live nested dicts; nothing is copied up front."""
+    __slots__ = ("_d",)
+
+    def __init__(self, d: dict):
+        self._d = d
+
+    def __getitem__(self, key):
+        return _wrap(self._d[key])
+
+    def __iter__(self):
+        return iter(self._d)
+
+    def __len__(self):
+        return len(self._d)
+
+    def __contains__(self, key):
+        return key in self._d
+
+
+def _wrap(value):
+    if isinstance(value, dict):
+        return _View(value)
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+class Transaction:
+    """Reads and buffered writes of one mutation, validated at commit.
+
+    Conflicts are tracked per (week, user): writers on different users or
+    weeks never invalidate each other.
+    """
+    def __init__(self, repo: "Repository"):
+        self._repo = repo
+        self._seen = {}     # (week, user) -> version when first touched
+        self._writes = {}   # (week, user, day) -> tokens or None
+        self._cold = []     # archived weeks touched; restored before a rerun
+
+    def _touch(self, week_id: str, user_id: str):
+        if self._repo._is_cold(week_id) and week_id not in self._cold:
+            self._cold.append(week_id)
+        self._seen.setdefault((week_id, user_id), self._repo._versions.get((week_id, user_id), 0))
+
+    def get_day(self, week_id: str, user_id: str, day_iso: str) -> List[str]:
+        key = (week_id, user_id, day_iso)
+        if key in self._writes:
+            return list(self._writes[key] or [])
+        with self._repo._lock:
+            self._touch(week_id, user_id)
+            return list(storage.get_day(self._repo._hot(), *key) or [])
+
+    def set_day(self, week_id: str, user_id: str, day_iso: str, tokens: Optional[List[str]]):
+        with self._repo._lock:
+            self._touch(week_id, user_id)
+        self._writes[(week_id, user_id, day_iso)] = None if tokens is None else list(tokens)
+
+    def _valid(self) -> bool:
+        # a week archived since it was read counts as changed
+        versions, repo = self._repo._versions, self._repo
+        return all(versions.get(k, 0) == v and not repo._is_cold(k[0]) for k, v in self._seen.items())
+
+    def _apply(self):
+        for key, tokens in self._writes.items():
+            self._repo._set_day(*key, tokens)
+
+
+class Repository:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._flush_lock = threading.RLock()  # one flush at a time, in order
+        self._data: Optional[dict] = None   # hot weeks only; archived weeks stay cold
+        self._archived: Set[str] = set()    # week ids in the archive, so writes never stat it
+        self._dirty = {}                    # (week, user, day) -> None, in write order
+        self._restored: List[str] = []      # archived weeks pulled back by a write
+        self._waiters = []                  # futures resolved by the next flush
+        self._expedite: Optional[asyncio.TimerHandle] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._versions = {}                 # (week, user) -> writes applied so far
+        # materialized week summaries, kept in step with every _set_day
+        self._counts = {}                   # week -> user -> habit -> tokens logged
+        self._totals = {}                   # week -> user -> habit -> minutes/pages
+        self._streaks = StreakIndex()       # hot and archived days, all history
+        self._engine = analytics.Engine()   # same history as dense arrays
+        self._team = TeamIndex()            # (habit, day) -> bitset of users
+        self._sketches = SketchIndex()      # per-week minute/page quantile sketches
+        self._alltime = {}                  # user -> habit -> all-time minutes/pages
+        self._reports = {}                  # closed week -> frozen report (data/reports)
+        self._stale_reports = {}            # frozen week -> writes since; refrozen by flush
+        self._freezing: Set[str] = set()    # weeks report() is writing right now
+        self.flushes = 0
+        self.mutations = 0
+        self.conflicts = 0
+
+    def _hot(self) -> dict:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = storage.load()
+                    self._archived = set(archive.week_ids())
+                    reports.load_index()
+                    self.rebuild_summaries()
+                    self.rebuild_history()
+                    alltime = storage.load_totals()
+                    if alltime is None:
+                        alltime = self._engine.totals()
+                        storage.save_totals(alltime)
+                    self._alltime = alltime
+        return self._data
+
+    # ---------- readers ----------
+    def all(self) -> Mapping:
+        """Every hot week: {week_id: {user_id: {day_iso: (tokens,)}}}."""
+        return _View(self._hot())
+
+    def week(self, week_id: str) -> Mapping:
+        """{user_id: {day_iso: (tokens,)}} for one week, hot or archived."""
+        week = self._hot().get(week_id)
+        if week is not None:
+            return _View(week)
+        if week_id in self._archived:
+            return storage.freeze(archive.load_week(week_id))
+        return storage.EMPTY
+
+    def weeks(self, week_ids) -> dict:
+        """{week_id: week} for the requested weeks that have any data."""
+        out = {w: self.week(w) for w in week_ids}
+        return {w: week for w, week in out.items() if week}
+
+    def summary(self, week_id: str) -> Mapping:
+        """{user_id: {habit: tokens logged}} for one week, hot or archived."""
+        self._hot()
+        counts = self._counts.get(week_id)
+        if counts is not None:
+            return _View(counts)
+        cold = archive.summaries().get(week_id, {})
+        return storage.freeze({uid: {h: s["count"] for h, s in per.items()} for uid, per in cold.items()})
+
+    def totals(self, week_id: str) -> Mapping:
+        """{user_id: {habit: minutes/pages}} for one week, hot or archived."""
+        self._hot()
+        totals = self._totals.get(week_id)
+        if totals is not None:
+            return _View(totals)
+        cold = archive.summaries().get(week_id, {})
+        return storage.freeze({uid: {h: s["total"] for h, s in per.items()} for uid, per in cold.items()})
+
+    def streak(self, user_id: str, habit: str, today: date) -> Tuple[int, int]:
+        """(current, best) streak in days for one habit, over the full history."""
+        self._hot()
+        return self._streaks.current(user_id, habit, today), self._streaks.best(user_id, habit)
+
+    def leaderboard(self) -> Mapping:
+        """{user_id: {habit: all-time minutes/pages}}, kept up to date on every write."""
+        self._hot()
+        return _View(self._alltime)
+
+    def engine(self) -> analytics.Engine:
+        """NumPy arrays of the full history for team-wide analytics."""
+        self._hot()
+        return self._engine
+
+    def report(self, week_id: str, level: int, freeze: bool = False) -> Mapping:
+        """Frozen report for a closed week (see reports.py), read from disk.
+        A week not frozen yet is built under rank `level`, and written only
+        with freeze=True, which the week-close job passes with the rank that
+        was in effect. Weeks with a backdated write not yet flushed are built
+        live. Blocking; call through storage_io."""
+        self._hot()
+        with self._lock:
+            rep = self._reports.get(week_id)
+            if rep is not None:
+                return _View(rep)
+        # the lock only covers memory; report files and the archive are read without it
+        frozen = reports.load(week_id)
+        with self._lock:
+            if frozen is not None and week_id not in self._stale_reports:
+                self._reports[week_id] = frozen
+                return _View(frozen)
+        cold = self.week(week_id) if self._is_cold(week_id) else None
+        with self._lock:
+            rep = reports.build(week_id, self._data.get(week_id, cold or {}),
+                                frozen["rank"] if frozen else level)
+            if frozen is not None or not freeze:
+                return _View(rep)
+            self._freezing.add(week_id)   # a write from here on marks it stale
+        try:
+            reports.save(rep)
+        finally:
+            with self._lock:
+                self._freezing.discard(week_id)
+                if week_id not in self._stale_reports:
+                    self._reports[week_id] = rep
+        return _View(rep)
+
+    def team(self) -> TeamIndex:
+        """(habit, day) -> user bitsets over the full history."""
+        self._hot()
+        return self._team
+
+    def sketches(self) -> SketchIndex:
+        """Per-week quantile sketches of minute/page values, full history."""
+        self._hot()
+        return self._sketches
+
+    def streak_habits(self, user_id: str) -> Set[str]:
+        """Every habit the user has ever logged, hot or archived."""
+        self._hot()
+        return self._streaks.habits(user_id)
+
+    # ---------- summaries ----------
+    def rebuild_summaries(self):
+        """Recompute every hot week's summary from the raw days."""
+        with self._lock:
+            self._counts, self._totals = {}, {}
+            for week_id, week in self._data.items():
+                for uid, days in week.items():
+                    for tokens in days.values():
+                        self._tally(week_id, uid, tokens, 1)
+
+    def rebuild_history(self):
+        """Rebuild the streak index, analytics arrays, team index and sketches
+        from every logged day, archived weeks included (reads the archive)."""
+        with self._lock:
+            cold = [archive.load_week(w) for w in sorted(self._archived) if w not in self._data]
+            self._streaks.build(itertools.chain(cold, self._data.values()))
+            self._engine.build(itertools.chain(cold, self._data.values()))
+            self._team.build(itertools.chain(cold, self._data.values()))
+            self._sketches.build(itertools.chain(cold, self._data.values()))
+
+    def _tally(self, week_id: str, user_id: str, tokens, sign: int):
+        if not tokens:
+            return
+        counts = self._counts.setdefault(week_id, {}).setdefault(user_id, {})
+        totals = self._totals.setdefault(week_id, {}).setdefault(user_id, {})
+        for tok in tokens:
+            habit = archive.token_habit(tok)
+            n = counts.get(habit, 0) + sign
+            if n:
+                counts[habit] = n
+                totals[habit] = totals.get(habit, 0) + sign * archive.token_amount(tok)
+            else:
+                counts.pop(habit, None)
+                totals.pop(habit, None)
+        if not counts:
+            del self._counts[week_id][user_id]
+            del self._totals[week_id][user_id]
+
+    def _add_alltime(self, user_id: str, tokens, sign: int):
+        for tok in tokens or ():
+            amount = archive.token_amount(tok)
+            if not amount:
+                continue
+            per_habit = self._alltime.setdefault(user_id, {})
+            habit = archive.token_habit(tok)
+            total = per_habit.get(habit, 0) + sign * amount
+            if total:
+                per_habit[habit] = total
+            else:
+                per_habit.pop(habit, None)
+                if not per_habit:
+                    del self._alltime[user_id]
+
+    # ---------- writers ----------
+    def _is_cold(self, week_id: str) -> bool:
+        """True for an archived week that is not back in the hot store."""
+        return week_id in self._archived and week_id not in self._hot()
+
+    def restore(self, week_ids: List[str]):
+        """Move archived weeks back into the hot store ahead of a backdated
+        write. Blocking; holds _flush_lock, like archiving, so the archive
+        can't change between the read and the swap."""
+        with self._flush_lock:
+            for week_id in week_ids:
+                if not self._is_cold(week_id):
+                    continue
+                week = archive.load_week(week_id)
+                with self._lock:
+                    self._data[week_id] = week
+                    self._archived.discard(week_id)
+                    self._restored.append(week_id)
+                    for uid, days in week.items():
+                        for day, tokens in days.items():
+                            self._dirty[(week_id, uid, day)] = None
+                            self._tally(week_id, uid, tokens, 1)
+
+    def _set_day(self, week_id: str, user_id: str, day_iso: str, tokens: Optional[List[str]]):
+        """Change one day in memory and mark it for the next flush. Caller
+        holds _lock; an archived week must have been restored first."""
+        data = self._hot()
+        # everything that can fail (bad date or value, array growth) happens
+        # before the summaries or any index change
+        old = storage.get_day(data, week_id, user_id, day_iso)
+        self._engine.update(user_id, day_iso, tokens)
+        if week_id in self._stale_reports or week_id in self._freezing or reports.has(week_id):
+            self._reports.pop(week_id, None)
+            self._stale_reports[week_id] = self._stale_reports.get(week_id, 0) + 1
+        self._tally(week_id, user_id, old, -1)
+        self._add_alltime(user_id, old, -1)
+        self._add_alltime(user_id, tokens, 1)
+        self._streaks.update(user_id, day_iso, old, tokens)
+        self._team.update(user_id, day_iso, old, tokens)
+        self._sketches.update(user_id, day_iso, old, tokens)
+        storage.set_day(data, week_id, user_id, day_iso, tokens)
+        self._tally(week_id, user_id, tokens, 1)
+        self._dirty[(week_id, user_id, day_iso)] = None
+        self._versions[(week_id, user_id)] = self._versions.get((week_id, user_id), 0) + 1
+
+    def _attempt(self, mutate: Callable[["Transaction"], object]):
+        """(result, []) once mutate is applied, or (None, weeks) if it touched
+        archived weeks, which must be restored before it is run again."""
+        for attempt in range(TXN_RETRIES + 1):
+            if attempt == TXN_RETRIES:
+                with self._lock:
+                    txn = Transaction(self)
+                    result = mutate(txn)
+                    if txn._cold:
+                        return None, txn._cold
+                    txn._apply()
+                    break
+            txn = Transaction(self)
+            result = mutate(txn)
+            if txn._cold:
+                return None, txn._cold
+            with self._lock:
+                if txn._valid():
+                    txn._apply()
+                    break
+            self.conflicts += 1
+        self.mutations += 1
+        return result, []
+
+    def transact(self, mutate: Callable[["Transaction"], object]):
+        """Run `mutate(txn)` as an optimistic transaction and return its result.
+
+        mutate reads and writes through the Transaction without holding the
+        lock. At commit every (week, user) it touched must still be at the
+        version it saw; otherwise mutate is re-run on fresh data. The last
+        attempt runs under the lock so a hot key can't starve a writer.
+        Archived weeks it touches are restored here, reading the archive.
+        """
+        while True:
+            result, cold = self._attempt(mutate)
+            if not cold:
+                return result
+            self.restore(cold)
+
+    async def commit(self, mutate: Callable[["Transaction"], object]):
+        """transact(mutate), then return its result once the change is on disk.
+        Archived weeks are restored on the storage worker, not the event loop."""
+        while True:
+            result, cold = self._attempt(mutate)
+            if not cold:
+                break
+            await storage_io.run(self.restore, cold)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._waiters.append(fut)
+        if self._expedite is None:
+            self._expedite = loop.call_later(
+                COMMIT_WINDOW, lambda: loop.create_task(self._flush_waiters()))
+        await fut
+        return result
+
+    # ---------- persistence ----------
+    def _snapshot(self, keys) -> dict:
+        """Copy of the weeks save_days needs for `keys`. Caller holds _lock."""
+        if storage.writes_whole_store():
+            week_ids = list(self._data)
+        else:
+            week_ids = {week_id for week_id, _, _ in keys if week_id in self._data}
+        return {w: {u: {d: list(t) for d, t in days.items()} for u, days in self._data[w].items()}
+                for w in week_ids}
+
+    def flush(self):
+        """Write every dirty day in one storage call. Blocking; safe from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                keys, self._dirty = list(self._dirty), {}
+                restored, self._restored = self._restored, []
+                snapshot = self._snapshot(keys)
+                alltime = {u: dict(per) for u, per in self._alltime.items()}
+                refreeze = {w: n for w, n in self._stale_reports.items() if w in snapshot}
+            try:
+                storage.save_days(snapshot, keys)
+                storage.save_totals(alltime)
+                for week_id in restored:
+                    archive.remove(week_id)
+                for week_id in refreeze:
+                    old = reports.load(week_id)
+                    if old is not None:
+                        reports.save(reports.build(week_id, snapshot[week_id], old["rank"]))
+            except Exception:
+                with self._lock:
+                    self._dirty = dict.fromkeys(keys + list(self._dirty))
+                    self._restored = restored + self._restored
+                raise
+            with self._lock:
+                # a week written again since the snapshot stays stale
+                for week_id, writes in refreeze.items():
+                    if self._stale_reports.get(week_id) == writes:
+                        del self._stale_reports[week_id]
+            self.flushes += 1
+
+    async def _flush_waiters(self):
+        self._expedite = None
+        waiters, self._waiters = self._waiters, []
+        try:
+            await storage_io.run(self.flush)
+        except Exception as e:
+            print(f"⚠️ progress flush failed, will retry: {e}")
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(None)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await storage_io.run(self.flush)
+            except Exception as e:
+                print(f"⚠️ progress flush failed, will retry: {e}")
+
+    async def start(self):
+        """Load the store and start the write-behind timer."""
+        await storage_io.run(self._hot)
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self):
+        """Stop the timer and flush whatever is still pending."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._expedite is not None:
+            self._expedite.cancel()
+        await self._flush_waiters()
+
+    def archive_closed_weeks(self, current_week: str) -> List[str]:
+        """Move weeks older than storage.ARCHIVE_AFTER_WEEKS to the cold archive.
+        Blocking; runs nightly on the storage worker."""
+        cutoff = (date.fromisoformat(current_week)
+                  - timedelta(weeks=storage.ARCHIVE_AFTER_WEEKS)).isoformat()
+        with self._flush_lock:
+            self.flush()
+            # detach under the lock, write without it: a write that touches a
+            # detached week sees it as archived, and its restore waits on _flush_lock
+            with self._lock:
+                data = self._hot()
+                closed = sorted(w for w in data if w < cutoff)
+                if not closed:
+                    return closed
+                weeks = {w: data.pop(w) for w in closed}
+                self._archived.update(closed)
+                self._dirty = {k: None for k in self._dirty if k[0] not in weeks}
+                store = {w: {u: {d: list(t) for d, t in days.items()} for u, days in week.items()}
+                         for w, week in data.items()}
+                store.update(weeks)
+                alltime = {u: dict(per) for u, per in self._alltime.items()}
+            try:
+                storage.archive_closed_weeks(store, closed)
+                storage.save_totals(alltime)
+            except Exception:
+                with self._lock:
+                    data.update(weeks)
+                    self._archived.difference_update(closed)
+                raise
+            with self._lock:
+                for week_id in closed:
+                    self._counts.pop(week_id, None)
+                    self._totals.pop(week_id, None)
+            return closed
+
+repo = Repository()
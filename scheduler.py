@@ -0,0 +1,109 @@
+# scheduler.py
+# One wall-clock scheduler for every daily job. Jobs are declared with
+# @job(name, hour, minute) and kept in a heap of next fire times in
+# LOCAL_TZ; the loop sleeps until the earliest one. The scheduled time of
+# each job's last run is persisted in meta, so a run missed while the bot
+# was down is made up on startup if it is still within the job's grace.
+import asyncio
+import heapq
+import time
+import datetime as dt
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from helpers import LOCAL_TZ, load_meta, save_meta
+from storage_io import run as run_io
+
+
+class Job:
+    def __init__(self, name: str, at: dt.time, fn: Callable[[datetime], Awaitable], grace: timedelta):
+        self.name = name
+        self.at = at
+        self.fn = fn
+        self.grace = grace
+
+    def fire_on(self, day: dt.date) -> datetime:
+        return datetime.combine(day, self.at, tzinfo=LOCAL_TZ)
+
+    def last_fire(self, now: datetime) -> datetime:
+        """Most recent scheduled time at or before now."""
+        fire = self.fire_on(now.date())
+        return fire if fire <= now else self.fire_on(now.date() - timedelta(days=1))
+
+
+_jobs: Dict[str, Job] = {}
+_runner: Optional[asyncio.Task] = None
+_running = set()   # job tasks in flight (keeps them referenced)
+
+
+def job(name: str, hour: int, minute: int = 0, grace: timedelta = timedelta(hours=1)):
+    """Register `async fn(when)` to run daily at hour:minute LOCAL_TZ.
+
+    `when` is the scheduled time being served (earlier than now for a
+    catch-up run). A missed run is made up on startup while less than
+    `grace` late; only the most recent missed run is made up.
+    """
+    def register(fn):
+        _jobs[name] = Job(name, dt.time(hour, minute), fn, grace)
+        return fn
+    return register
+
+
+def start(bot):
+    """Start the scheduler once the bot is ready; safe to call on every on_ready."""
+    global _runner
+    if _runner is None or _runner.done():
+        _runner = asyncio.get_running_loop().create_task(_run(bot))
+
+
+def _save_stamp(name: str, when_iso: str):
+    meta = load_meta()
+    meta.setdefault("job_runs", {})[name] = when_iso
+    save_meta(meta)
+
+async def _stamp(name: str, when: datetime):
+    # read-modify-write in one storage job, so concurrent stamps don't clobber
+    await run_io(_save_stamp, name, when.isoformat())
+
+
+async def _fire(j: Job, when: datetime):
+    try:
+        await j.fn(when)
+    except Exception as e:
+        print(f"⚠️ scheduled job {j.name} failed: {e}")
+    await _stamp(j.name, when)
+
+
+def _launch(j: Job, when: datetime):
+    task = asyncio.get_running_loop().create_task(_fire(j, when))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+
+async def _run(bot):
+    await bot.wait_until_ready()
+    now = datetime.now(LOCAL_TZ)
+    last_runs = (await run_io(load_meta)).get("job_runs", {})
+
+    heap: List[tuple] = []
+    for j in _jobs.values():
+        due = j.last_fire(now)
+        ran = last_runs.get(j.name)
+        late = now.timestamp() - due.timestamp()
+        if ran is not None and datetime.fromisoformat(ran) < due and late < j.grace.total_seconds():
+            print(f"Catching up missed {j.name} run scheduled for {due:%Y-%m-%d %H:%M}")
+            _launch(j, due)
+        elif ran is None:
+            await _stamp(j.name, due)   # first start: nothing to make up
+        heapq.heappush(heap, (j.fire_on(due.date() + timedelta(days=1)), j.name))
+
+    while heap:
+        when, name = heap[0]
+        delay = when.timestamp() - time.time()   # real seconds, across DST changes
+        if delay > 0:
+            await asyncio.sleep(delay)
+            continue   # re-check the clock after waking
+        heapq.heappop(heap)
+        j = _jobs[name]
+        _launch(j, when)
+        heapq.heappush(heap, (j.fire_on(when.date() + timedelta(days=1)), name))
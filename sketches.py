@@ -0,0 +1,104 @@
+# sketches.py
+# Mergeable quantile sketches of minute/page values (DDSketch-style): each
+# value lands in a log-spaced bucket, so any quantile is within
+# SKETCH_ACCURACY of the true value, sketches merge by adding bucket counts,
+# and an edited check-in is removed exactly by decrementing its bucket.
+# SketchIndex keeps one sketch per (week, user, habit) plus a team sketch
+# per (week, habit); ranges of weeks are answered by merging.
+import math
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import archive
+
+SKETCH_ACCURACY = float(os.getenv("SKETCH_ACCURACY", "0.01"))
+
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class Sketch:
+    __slots__ = ("buckets", "count")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}   # bucket -> values in it
+        self.count = 0
+
+    def add(self, value: int, n: int = 1):
+        """Add n copies of a positive value (negative n removes them)."""
+        b = math.ceil(math.log(value) / _LOG_GAMMA)
+        left = self.buckets.get(b, 0) + n
+        if left > 0:
+            self.buckets[b] = left
+        else:
+            self.buckets.pop(b, None)
+        self.count += n
+
+    def merge(self, other: "Sketch"):
+        for b, n in other.buckets.items():
+            self.buckets[b] = self.buckets.get(b, 0) + n
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen > rank:
+                return 2 * _GAMMA ** b / (_GAMMA + 1)
+        return 2 * _GAMMA ** max(self.buckets) / (_GAMMA + 1)
+
+
+def _week_of(day_iso: str) -> str:
+    d = date.fromisoformat(day_iso)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def _amounts(tokens) -> Iterable[Tuple[str, int]]:
+    for tok in tokens or ():
+        amount = archive.token_amount(tok)
+        if amount > 0:
+            yield archive.token_habit(tok), amount
+
+
+class SketchIndex:
+    def __init__(self):
+        # (week_id, user_id or None for the team, habit) -> Sketch
+        self._sketches: Dict[Tuple[str, Optional[str], str], Sketch] = {}
+
+    def build(self, weeks: Iterable[dict]):
+        """Drop every sketch and re-add each logged minute/page value in weeks."""
+        self.__init__()
+        for week in weeks:
+            for uid, days in week.items():
+                for day_iso, tokens in days.items():
+                    self.update(uid, day_iso, None, tokens)
+
+    def _add(self, week_id: str, user_id: str, tokens, sign: int):
+        for habit, amount in _amounts(tokens):
+            for key in ((week_id, user_id, habit), (week_id, None, habit)):
+                sketch = self._sketches.get(key)
+                if sketch is None:
+                    sketch = self._sketches[key] = Sketch()
+                sketch.add(amount, sign)
+                if not sketch.count:
+                    del self._sketches[key]
+
+    def update(self, user_id: str, day_iso: str, old_tokens, new_tokens):
+        """Take the day's old values out of its week's user and team sketches
+        and add the new ones; a sketch left empty is dropped."""
+        week_id = _week_of(day_iso)
+        self._add(week_id, user_id, old_tokens, -1)
+        self._add(week_id, user_id, new_tokens, 1)
+
+    def weeks(self, user_id: Optional[str], habit: str, week_ids: List[str]) -> Sketch:
+        """One sketch merged over week_ids; user_id None for the whole team."""
+        out = Sketch()
+        for week_id in week_ids:
+            sketch = self._sketches.get((week_id, user_id, habit))
+            if sketch is not None:
+                out.merge(sketch)
+        return out
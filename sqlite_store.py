@@ -0,0 +1,223 @@
+# sqlite_store.py
+# SQLite (WAL) backend for progress, rank, meta and check-in post state.
+#
+# One-shot migration from the JSON side-files:
+#   python sqlite_store.py migrate
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+DB_FILE = Path("data/habitbot.db")
+
+# One row per token, in the day's order (pos). A day logged with no tokens
+# is kept as a single row with habit NULL, so it survives a reload.
+CHECKINS = [
+    """CREATE TABLE IF NOT EXISTS checkins (
+    week  TEXT NOT NULL,
+    user  TEXT NOT NULL,
+    day   TEXT NOT NULL,
+    pos   INTEGER NOT NULL,
+    habit TEXT,
+    value INTEGER,
+    PRIMARY KEY (week, user, day, pos)
+)""",
+    "CREATE INDEX IF NOT EXISTS checkins_by_user ON checkins (user, day)",
+]
+
+SCHEMA = ";\n".join(CHECKINS) + """;
+CREATE TABLE IF NOT EXISTS kv (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkin_posts (
+    message_id INTEGER PRIMARY KEY,
+    day        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checkin_posts_by_day ON checkin_posts (day);
+"""
+
+_conn = None
+_lock = threading.RLock()
+
+def connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(DB_FILE), check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        if "pos" not in {row[1] for row in conn.execute("PRAGMA table_info(checkins)")}:
+            _upgrade(conn)
+        _conn = conn
+    return _conn
+
+def _upgrade(conn: sqlite3.Connection):
+    """Rebuild a checkins table keyed by (week, user, day, habit) with
+    positions, keeping each day's tokens in rowid order."""
+    rows = conn.execute("SELECT week, user, day, habit, value FROM checkins ORDER BY rowid").fetchall()
+    positions = {}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP TABLE checkins")
+        for ddl in CHECKINS:
+            conn.execute(ddl)
+        for week, user, day, habit, value in rows:
+            pos = positions[(week, user, day)] = positions.get((week, user, day), -1) + 1
+            conn.execute("INSERT INTO checkins VALUES (?, ?, ?, ?, ?, ?)", (week, user, day, pos, habit, value))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def close():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+class _tx:
+    """BEGIN IMMEDIATE ... COMMIT under the module lock."""
+    def __enter__(self):
+        _lock.acquire()
+        self.conn = connect()
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            _lock.release()
+
+# ---------- token <-> row ----------
+MAX_VALUE = 2 ** 63 - 1   # SQLite INTEGER
+
+def _split(token: str):
+    name, sep, val = token.partition(":")
+    if not sep:
+        return name, None
+    # only values that come back byte-for-byte: ASCII, no leading zeros, fits INTEGER
+    if val.isascii() and val.isdigit() and str(int(val)) == val and int(val) <= MAX_VALUE:
+        return name, int(val)
+    return token, None   # odd value: keep the whole token as the habit
+
+def _join(habit: str, value) -> str:
+    return habit if value is None else f"{habit}:{value}"
+
+def _day_rows(week_id: str, user_id: str, day_iso: str, tokens) -> list:
+    if not tokens:
+        return [(week_id, user_id, day_iso, 0, None, None)]
+    return [(week_id, user_id, day_iso, pos) + _split(tok) for pos, tok in enumerate(tokens)]
+
+def _rows_to_weeks(rows) -> dict:
+    data = {}
+    for week, user, day, habit, value in rows:
+        tokens = data.setdefault(week, {}).setdefault(user, {}).setdefault(day, [])
+        if habit is not None:
+            tokens.append(_join(habit, value))
+    return data
+
+# ---------- progress ----------
+def load_progress() -> dict:
+    with _lock:
+        rows = connect().execute(
+            "SELECT week, user, day, habit, value FROM checkins ORDER BY week, user, day, pos"
+        ).fetchall()
+    return _rows_to_weeks(rows)
+
+def save_progress(data: dict):
+    rows = [
+        row
+        for week, users in data.items()
+        for user, days in users.items()
+        for day, tokens in days.items()
+        for row in _day_rows(week, user, day, tokens)
+    ]
+    with _tx() as conn:
+        conn.execute("DELETE FROM checkins")
+        conn.executemany("INSERT INTO checkins VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+def put_days(entries):
+    """Replace the rows of (week, user, day, tokens) entries in one transaction.
+
+    tokens=None removes the day; the tokens are stored in order,
+    duplicates and empty days included.
+    """
+    with _tx() as conn:
+        for week_id, user_id, day_iso, tokens in entries:
+            conn.execute("DELETE FROM checkins WHERE week = ? AND user = ? AND day = ?",
+                         (week_id, user_id, day_iso))
+            if tokens is not None:
+                conn.executemany("INSERT INTO checkins VALUES (?, ?, ?, ?, ?, ?)",
+                                 _day_rows(week_id, user_id, day_iso, tokens))
+
+# ---------- rank / meta ----------
+def _get_kv(key: str, default=None):
+    with _lock:
+        row = connect().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else default
+
+def _set_kv(key: str, value):
+    with _tx() as conn:
+        conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (key, json.dumps(value)))
+
+def load_rank() -> int:
+    return _get_kv("rank", 1)
+
+def save_rank(rank: int):
+    _set_kv("rank", rank)
+
+def load_meta() -> dict:
+    return _get_kv("meta", {})
+
+def save_meta(meta: dict):
+    _set_kv("meta", meta)
+
+# ---------- check-in posts ----------
+def load_posts() -> dict:
+    with _lock:
+        rows = connect().execute(
+            "SELECT day, message_id FROM checkin_posts ORDER BY rowid"
+        ).fetchall()
+    posts = {}
+    for day, mid in rows:
+        posts.setdefault(day, []).append(mid)
+    return posts
+
+def save_posts(posts: dict):
+    with _tx() as conn:
+        conn.execute("DELETE FROM checkin_posts")
+        conn.executemany(
+            "INSERT OR REPLACE INTO checkin_posts (message_id, day) VALUES (?, ?)",
+            [(mid, day) for day, ids in posts.items() for mid in ids],
+        )
+
+# ---------- migration ----------
+def migrate(data_dir: Path = Path("data")):
+    """Import the JSON side-files into the database, replacing its contents."""
+    def read(name, default):
+        path = data_dir / name
+        return json.loads(path.read_text()) if path.exists() else default
+
+    import storage  # late import: storage dispatches to this module
+    progress = read("progress.json", {})
+    # pick up anything still sitting in a journal-mode log
+    storage.replay_journal(progress, data_dir / "progress.log.1")
+    storage.replay_journal(progress, data_dir / "progress.log")
+    save_progress(progress)
+    save_rank(read("rank.json", {}).get("rank", 1))
+    save_meta(read("meta.json", {}))
+    save_posts(read("checkin_posts.json", {}))
+
+    with _lock:
+        n = connect().execute("SELECT COUNT(*) FROM checkins WHERE habit IS NOT NULL").fetchone()[0]
+    print(f"Migrated {len(progress)} weeks ({n} check-ins) into {DB_FILE}")
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit("usage: python sqlite_store.py migrate")
+    migrate()
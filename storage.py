@@ -1,12 +1,323 @@
 # storage.py
 import json
+import os
+import threading
+from collections.abc import Mapping
 from pathlib import Path
+from types import MappingProxyType
+
+import archive
+import packed
+import sqlite_store
+
 DATA_FILE = Path("data/progress.json")
 
-def load():
+# journal mode: every changed day is appended to JOURNAL_FILE as one compact
+# record; DATA_FILE becomes the latest snapshot and is rewritten in the
+# background once the journal grows past JOURNAL_COMPACT_BYTES.
+JOURNAL_FILE = Path("data/progress.log")
+BACKEND = os.getenv("STORAGE_BACKEND", "json")   # "json" | "journal" | "sqlite" | "weekly" | "packed"
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(256 * 1024)))
+
+# weekly mode: one file per week ID under WEEKS_DIR; a flush rewrites only
+# the weeks it touched.
+WEEKS_DIR = Path("data/progress")
+
+# packed mode: the binary encoding in packed.py.
+PACKED_FILE = Path("data/progress.bin")
+
+# closed weeks older than this move to the compressed archive (archive.py).
+# Streaks, totals and analytics cover archived weeks too; this only bounds
+# how much raw history the repository keeps and flushes as live data.
+ARCHIVE_AFTER_WEEKS = int(os.getenv("ARCHIVE_AFTER_WEEKS", "13"))
+
+# running all-time totals {user: {habit: minutes/pages}}, stamped with the
+# store files' signature so a stale copy (crash, manual edit) is ignored.
+TOTALS_FILE = Path("data/leaderboard.json")
+
+_journal_lock = threading.Lock()    # guards appends + log rotation
+_snapshot_lock = threading.Lock()   # guards DATA_FILE rewrites
+_compactor = None
+_week_lock = threading.RLock()
+EMPTY = MappingProxyType({})
+
+def freeze(obj):
+    """Read-only view of nested dicts/lists: mappingproxies and tuples."""
+    if isinstance(obj, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+def _stat(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _signature():
+    """(path, (mtime_ns, size)) of every file backing the store."""
+    if BACKEND == "sqlite":
+        db = sqlite_store.DB_FILE
+        files = [db, db.with_name(db.name + "-wal")]
+    elif BACKEND == "weekly":
+        files = sorted(WEEKS_DIR.glob("*.json"))
+    elif BACKEND == "journal":
+        files = [DATA_FILE, _rotated_file(), JOURNAL_FILE]
+    elif BACKEND == "packed":
+        files = [PACKED_FILE, DATA_FILE]
+    else:
+        files = [DATA_FILE]
+    return tuple((str(p), _stat(p)) for p in files)
+
+def _rotated_file() -> Path:
+    return JOURNAL_FILE.with_name(JOURNAL_FILE.name + ".1")
+
+def _read_snapshot() -> dict:
+    if DATA_FILE.exists():
+        return json.loads(DATA_FILE.read_text())
+    return {}
+
+def _write_snapshot(data: dict):
+    tmp = DATA_FILE.with_name(DATA_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")))
+    os.replace(tmp, DATA_FILE)
+
+def replay_journal(data: dict, path: Path):
+    """Apply every record in a journal file to `data`, oldest first."""
+    if not path.exists():
+        return
+    with path.open() as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break   # torn final line from a crash mid-append
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                print(f"⚠️ skipping unreadable journal record in {path}")
+                continue
+            set_day(data, rec["w"], rec["u"], rec["d"], rec["t"])
+
+def _trim_torn_tail(path: Path):
+    """Cut a partial last record (crash mid-append) so new records start on
+    their own line. Caller must hold _journal_lock."""
+    try:
+        f = path.open("rb+")
+    except FileNotFoundError:
+        return
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        if not size:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # walk back to the last complete record
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl >= 0:
+                pos = pos - step + nl + 1
+                break
+            pos -= step
+        f.truncate(pos)
+
+def writes_whole_store() -> bool:
+    """True if save_days rewrites the entire store, not just the touched weeks."""
+    return BACKEND in ("json", "packed")
+
+def load() -> dict:
+    """The whole store: {week_id: {user_id: {day_iso: [tasks]}}}."""
+    if BACKEND == "sqlite":
+        return sqlite_store.load_progress()
+    if BACKEND == "packed":
+        if PACKED_FILE.exists():
+            return packed.load(PACKED_FILE)
+        return _read_snapshot()   # first run: start from the legacy JSON
+    if BACKEND == "weekly":
+        return {week_id: _read_week(week_id) for week_id in week_ids()}
+    if BACKEND == "journal":
+        with _snapshot_lock:
+            data = _read_snapshot()
+            replay_journal(data, _rotated_file())
+            replay_journal(data, JOURNAL_FILE)
+        return data
     if DATA_FILE.exists():
         return json.loads(DATA_FILE.read_text())
     return {}          # {week_id: {user_id: {day_iso: [tasks]}}}
 
 def save(data: dict):
-    DATA_FILE.write_text(json.dumps(data, indent=2))
\ No newline at end of file
+    if BACKEND == "sqlite":
+        sqlite_store.save_progress(data)
+        return
+    if BACKEND == "packed":
+        packed.dump(data, PACKED_FILE)
+        return
+    if BACKEND == "weekly":
+        for week_id in set(week_ids()) - set(data):
+            (WEEKS_DIR / f"{week_id}.json").unlink(missing_ok=True)
+        _save_weeks(data, data.keys())
+        return
+    if BACKEND == "journal":
+        # a full save supersedes everything journalled so far
+        with _snapshot_lock, _journal_lock:
+            _write_snapshot(data)
+            _rotated_file().unlink(missing_ok=True)
+            JOURNAL_FILE.unlink(missing_ok=True)
+        return
+    DATA_FILE.write_text(json.dumps(data, indent=2))
+
+def load_totals():
+    """Persisted all-time totals, or None if missing or out of step with the store."""
+    if not TOTALS_FILE.exists():
+        return None
+    saved = json.loads(TOTALS_FILE.read_text())
+    stamp = json.loads(json.dumps(_signature()))
+    return saved["totals"] if saved.get("stamp") == stamp else None
+
+def _write_totals(stamp, totals: dict):
+    TOTALS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = TOTALS_FILE.with_name(TOTALS_FILE.name + ".tmp")
+    tmp.write_text(json.dumps({"stamp": stamp, "totals": totals}, separators=(",", ":")))
+    os.replace(tmp, TOTALS_FILE)
+
+def save_totals(totals: dict):
+    """Persist all-time totals; call right after the store itself was written."""
+    with _snapshot_lock:   # not mid-compaction, so the stamp is one compact() can follow
+        _write_totals(_signature(), totals)
+
+def _restamp_totals(before: dict):
+    """Carry the totals stamp across a compaction. The snapshot and rotated
+    log hold the same days afterwards, so totals that matched their old
+    stats (`before`, path -> stat) still match; the journal entry is kept
+    as it was. Caller holds _snapshot_lock."""
+    try:
+        saved = json.loads(TOTALS_FILE.read_text())
+    except FileNotFoundError:
+        return
+    before = json.loads(json.dumps(before))
+    stamp = saved.get("stamp") or []
+    if {p for p, _ in stamp} >= set(before) and all(before[p] == st for p, st in stamp if p in before):
+        now = json.loads(json.dumps({p: _stat(Path(p)) for p in before}))
+        _write_totals([[p, now[p] if p in now else st] for p, st in stamp], saved["totals"])
+
+def archive_closed_weeks(data: dict, week_ids):
+    """Move the given closed weeks out of the hot store `data` and persist it.
+
+    Each week is written to the archive before it is dropped here, so a
+    crash in between only leaves a duplicate that the next run overwrites.
+    """
+    for week_id in week_ids:
+        archive.store_week(week_id, data.pop(week_id))
+    save(data)
+
+def set_day(data: dict, week_id: str, user_id: str, day_iso: str, tokens):
+    """Set one user's tokens for a day in memory; tokens=None removes the day."""
+    user_days = data.setdefault(week_id, {}).setdefault(user_id, {})
+    if tokens is None:
+        user_days.pop(day_iso, None)
+    else:
+        user_days[day_iso] = list(tokens)
+
+def get_day(data: dict, week_id: str, user_id: str, day_iso: str):
+    """Tokens stored for one user's day, or None if the day is absent."""
+    return data.get(week_id, {}).get(user_id, {}).get(day_iso)
+
+def save_days(data: dict, keys):
+    """Persist the (week_id, user_id, day_iso) entries of `data` in one write."""
+    keys = list(dict.fromkeys(keys))
+    if BACKEND == "sqlite":
+        sqlite_store.put_days([k + (get_day(data, *k),) for k in keys])
+        return
+    if BACKEND == "weekly":
+        _save_weeks(data, {week_id for week_id, _, _ in keys})
+        return
+    if BACKEND != "journal":
+        save(data)
+        return
+    lines = []
+    for week_id, user_id, day_iso in keys:
+        rec = {"w": week_id, "u": user_id, "d": day_iso, "t": get_day(data, week_id, user_id, day_iso)}
+        lines.append(json.dumps(rec, separators=(",", ":")) + "\n")
+    with _journal_lock:
+        _trim_torn_tail(JOURNAL_FILE)
+        with JOURNAL_FILE.open("a") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        if JOURNAL_FILE.stat().st_size >= JOURNAL_COMPACT_BYTES:
+            _start_compaction()
+
+# ---------- journal compaction ----------
+def _start_compaction():
+    """Rotate the journal and fold it into a new snapshot off-thread.
+
+    Caller must hold _journal_lock.
+    """
+    global _compactor
+    if _compactor is not None and _compactor.is_alive():
+        return
+    rotated = _rotated_file()
+    if rotated.exists():
+        # a previous compaction died halfway; let the next one pick it up
+        _trim_torn_tail(rotated)
+        with rotated.open("a") as dst, JOURNAL_FILE.open() as src:
+            dst.write(src.read())
+        JOURNAL_FILE.unlink()
+    else:
+        os.replace(JOURNAL_FILE, rotated)
+    _compactor = threading.Thread(target=compact, name="journal-compactor", daemon=True)
+    _compactor.start()
+
+def compact():
+    """Fold the rotated journal into DATA_FILE.
+
+    Records are absolute day values, so replaying a log that already made it
+    into the snapshot is harmless if we crash between replace and unlink.
+    """
+    rotated = _rotated_file()
+    with _snapshot_lock:
+        if not rotated.exists():
+            return
+        before = {str(p): _stat(p) for p in (DATA_FILE, rotated)}
+        data = _read_snapshot()
+        replay_journal(data, rotated)
+        _write_snapshot(data)
+        rotated.unlink()
+        _restamp_totals(before)
+
+# ---------- week-partitioned store ----------
+def _ensure_partitioned():
+    """Split a legacy progress.json into per-week files the first time we run."""
+    if WEEKS_DIR.exists():
+        return
+    legacy = json.loads(DATA_FILE.read_text()) if DATA_FILE.exists() else {}
+    WEEKS_DIR.mkdir(parents=True, exist_ok=True)
+    _save_weeks(legacy, legacy.keys())
+
+def week_ids():
+    """Every stored week ID, oldest first."""
+    with _week_lock:
+        _ensure_partitioned()
+        return sorted(p.stem for p in WEEKS_DIR.glob("*.json"))
+
+def _read_week(week_id: str) -> dict:
+    path = WEEKS_DIR / f"{week_id}.json"
+    return json.loads(path.read_text()) if path.exists() else {}
+
+def _save_weeks(data: dict, week_ids):
+    with _week_lock:
+        WEEKS_DIR.mkdir(parents=True, exist_ok=True)
+        for week_id in week_ids:
+            week = data.get(week_id, {})
+            path = WEEKS_DIR / f"{week_id}.json"
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(week, indent=2))
+            os.replace(tmp, path)
@@ -0,0 +1,33 @@
+# storage_io.py
+# Async facade over the blocking storage calls. Parsing, serialization and
+# disk writes run on one dedicated worker thread, so they never stall the
+# gateway heartbeat and writes reach disk in the order they were issued.
+# At most STORAGE_QUEUE jobs wait on the worker; further callers wait in
+# the event loop until a slot frees up.
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import rank_storage
+
+STORAGE_QUEUE = int(os.getenv("STORAGE_QUEUE", "64"))
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-io")
+_slots = None   # (loop, asyncio.Semaphore); semaphores belong to one loop
+
+async def run(fn, *args, **kwargs):
+    """Run a blocking storage call on the storage worker and await its result."""
+    global _slots
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots[0] is not loop:
+        _slots = (loop, asyncio.Semaphore(STORAGE_QUEUE))
+    async with _slots[1]:
+        call = functools.partial(fn, *args, **kwargs)
+        return await loop.run_in_executor(_executor, call)
+
+async def load_rank() -> int:
+    return await run(rank_storage.load)
+
+async def save_rank(rank: int):
+    await run(rank_storage.save, rank)
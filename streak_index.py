@@ -0,0 +1,123 @@
+# streak_index.py
+# Run-length index of the days each user logged each habit. Every
+# (user, habit) maps to sorted, disjoint runs of consecutive date ordinals,
+# so current and best streak are lookups over the whole history instead of
+# a day-by-day walk over a fixed window.
+import bisect
+from datetime import date
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from archive import habits_of
+
+
+class StreakIndex:
+    def __init__(self):
+        self._starts: Dict[Tuple[str, str], list] = {}   # run start ordinals
+        self._ends: Dict[Tuple[str, str], list] = {}     # run end ordinals (inclusive)
+        self._best: Dict[Tuple[str, str], Optional[int]] = {}   # None = recompute
+        self._by_user: Dict[str, Set[str]] = {}
+
+    def build(self, weeks: Iterable[dict]):
+        """Collect each (user, habit)'s logged days over all weeks, then
+        collapse them into runs; the best streak is computed lazily."""
+        logged = {}
+        for week in weeks:
+            for uid, days in week.items():
+                for day_iso, tokens in days.items():
+                    ordinal = date.fromisoformat(day_iso).toordinal()
+                    for habit in habits_of(tokens):
+                        logged.setdefault((uid, habit), set()).add(ordinal)
+        self.__init__()
+        for key, ordinals in logged.items():
+            starts, ends = self._starts[key], self._ends[key] = [], []
+            for ordinal in sorted(ordinals):
+                if ends and ends[-1] == ordinal - 1:
+                    ends[-1] = ordinal
+                else:
+                    starts.append(ordinal)
+                    ends.append(ordinal)
+            self._best[key] = None
+            self._by_user.setdefault(key[0], set()).add(key[1])
+
+    def update(self, user_id: str, day_iso: str, old_tokens, new_tokens):
+        """Split or join runs for the habits a day gained or lost."""
+        old, new = habits_of(old_tokens), habits_of(new_tokens)
+        if old == new:
+            return
+        ordinal = date.fromisoformat(day_iso).toordinal()
+        for habit in old - new:
+            self._remove((user_id, habit), ordinal)
+        for habit in new - old:
+            self._add((user_id, habit), ordinal)
+
+    def _add(self, key, day: int):
+        starts = self._starts.setdefault(key, [])
+        ends = self._ends.setdefault(key, [])
+        i = bisect.bisect_right(starts, day)
+        if i and ends[i - 1] >= day:
+            return
+        join_left = i and ends[i - 1] == day - 1
+        join_right = i < len(starts) and starts[i] == day + 1
+        if join_left and join_right:
+            ends[i - 1] = ends[i]
+            del starts[i], ends[i]
+            i -= 1
+        elif join_left:
+            ends[i - 1] = day
+            i -= 1
+        elif join_right:
+            starts[i] = day
+        else:
+            starts.insert(i, day)
+            ends.insert(i, day)
+        best = self._best.get(key, 0)
+        if best is not None:
+            self._best[key] = max(best, ends[i] - starts[i] + 1)
+        self._by_user.setdefault(key[0], set()).add(key[1])
+
+    def _remove(self, key, day: int):
+        starts, ends = self._starts.get(key), self._ends.get(key)
+        if not starts:
+            return
+        i = bisect.bisect_right(starts, day) - 1
+        if i < 0 or ends[i] < day:
+            return
+        start, end = starts[i], ends[i]
+        if start == end:
+            del starts[i], ends[i]
+        elif day == start:
+            starts[i] = day + 1
+        elif day == end:
+            ends[i] = day - 1
+        else:
+            ends[i] = day - 1
+            starts.insert(i + 1, day + 1)
+            ends.insert(i + 1, end)
+        if self._best.get(key) == end - start + 1:
+            self._best[key] = None
+        if not starts:
+            del self._starts[key], self._ends[key], self._best[key]
+            self._by_user[key[0]].discard(key[1])
+
+    def current(self, user_id: str, habit: str, today: date) -> int:
+        """Length of the run that includes today (0 if today isn't logged)."""
+        key, day = (user_id, habit), today.toordinal()
+        starts = self._starts.get(key)
+        if not starts:
+            return 0
+        i = bisect.bisect_right(starts, day) - 1
+        if i < 0 or self._ends[key][i] < day:
+            return 0
+        return day - starts[i] + 1
+
+    def best(self, user_id: str, habit: str) -> int:
+        key = (user_id, habit)
+        if key not in self._starts:
+            return 0
+        best = self._best[key]
+        if best is None:
+            best = self._best[key] = max(e - s + 1 for s, e in zip(self._starts[key], self._ends[key]))
+        return best
+
+    def habits(self, user_id: str) -> Set[str]:
+        return set(self._by_user.get(user_id, ()))
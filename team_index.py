@@ -0,0 +1,89 @@
+# team_index.py
+# Inverted index from (habit, day) to the set of users who logged it, as a
+# bitset in a Python int. Users are interned to bit positions, so team-wide
+# questions ("who did X every day this week", "how many did X on Tuesday")
+# are AND/OR/popcount over a handful of ints instead of a scan of every
+# user's days.
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from archive import habits_of
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+class TeamIndex:
+    def __init__(self):
+        self.users: List[str] = []
+        self._bit: Dict[str, int] = {}
+        self._days: Dict[Tuple[str, int], int] = {}   # (habit, ordinal) -> user bitset
+
+    def build(self, weeks: Iterable[dict]):
+        """Reset, then set a bit for every user, habit and day in weeks.
+        Bits are assigned in the order users are first seen."""
+        self.__init__()
+        for week in weeks:
+            for uid, days in week.items():
+                for day_iso, tokens in days.items():
+                    self.update(uid, day_iso, None, tokens)
+
+    def _user_bit(self, user_id: str) -> int:
+        bit = self._bit.get(user_id)
+        if bit is None:
+            bit = self._bit[user_id] = 1 << len(self.users)
+            self.users.append(user_id)
+        return bit
+
+    def update(self, user_id: str, day_iso: str, old_tokens, new_tokens):
+        """Clear the user's bit for habits the day lost and set it for habits
+        it gained; empty bitsets are dropped."""
+        old, new = habits_of(old_tokens), habits_of(new_tokens)
+        if old == new:
+            return
+        bit = self._user_bit(user_id)
+        ordinal = date.fromisoformat(day_iso).toordinal()
+        for habit in old - new:
+            key = (habit, ordinal)
+            bits = self._days.get(key, 0) & ~bit
+            if bits:
+                self._days[key] = bits
+            else:
+                self._days.pop(key, None)
+        for habit in new - old:
+            key = (habit, ordinal)
+            self._days[key] = self._days.get(key, 0) | bit
+
+    # ---------- queries ----------
+    def day(self, habit: str, day: date) -> int:
+        """Users who logged habit on day."""
+        return self._days.get((habit, day.toordinal()), 0)
+
+    def every_day(self, habit: str, start: date, end: date) -> int:
+        """Users who logged habit on every day from start to end inclusive."""
+        bits = -1
+        for ordinal in range(start.toordinal(), end.toordinal() + 1):
+            bits &= self._days.get((habit, ordinal), 0)
+            if not bits:
+                break
+        return max(bits, 0)
+
+    def any_day(self, habits: Iterable[str], start: date, end: date) -> int:
+        """Users who logged any of habits on any day from start to end inclusive."""
+        bits = 0
+        for habit in habits:
+            for ordinal in range(start.toordinal(), end.toordinal() + 1):
+                bits |= self._days.get((habit, ordinal), 0)
+        return bits
+
+    def members(self, bits: int) -> List[str]:
+        """User ids in a bitset, in first-seen order."""
+        out = []
+        i = 0
+        while bits:
+            if bits & 1:
+                out.append(self.users[i])
+            bits >>= 1
+            i += 1
+        return out